@@ -0,0 +1,60 @@
+import hmac
+import tracemalloc
+from typing import List
+from fastapi import APIRouter, HTTPException, Header, Query, Response
+from pydantic import BaseModel, Field
+
+from app.config import settings
+from app.services import profiling, token_service
+from app.services.audio_cache import audio_cache
+
+router = APIRouter()
+
+MAX_BULK_DEVICES = 10000
+
+class BulkStatusRequest(BaseModel):
+    device_ids: List[str] = Field(..., max_length=MAX_BULK_DEVICES)
+
+def require_admin(x_admin_key: str | None):
+    if not settings.admin_api_key:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not x_admin_key or not hmac.compare_digest(x_admin_key, settings.admin_api_key):
+        raise HTTPException(status_code=401, detail="Invalid admin key")
+
+@router.get("/debug/memory")
+async def memory_snapshot(
+    limit: int = Query(default=20, ge=1, le=200),
+    x_admin_key: str = Header(None, alias="X-Admin-Key")
+):
+    """Return top tracemalloc allocations grouped by subsystem."""
+    require_admin(x_admin_key)
+
+    if not tracemalloc.is_tracing():
+        raise HTTPException(status_code=409, detail="tracemalloc is not enabled")
+
+    return profiling.memory_report(limit)
+
+@router.get("/cache/stats")
+async def cache_stats(x_admin_key: str = Header(None, alias="X-Admin-Key")):
+    """Return audio cache size and hit ratio."""
+    require_admin(x_admin_key)
+    return audio_cache.stats()
+
+@router.get("/cache/hot")
+async def hot_phrases(
+    limit: int = Query(default=20, ge=1, le=1000),
+    x_admin_key: str = Header(None, alias="X-Admin-Key")
+):
+    """Return the most frequently requested synthesis keys."""
+    require_admin(x_admin_key)
+    return audio_cache.hot_phrases(limit)
+
+@router.post("/tokens/status")
+async def bulk_token_status(
+    request: BulkStatusRequest,
+    x_admin_key: str = Header(None, alias="X-Admin-Key")
+):
+    """Return token status for many devices, in request order."""
+    require_admin(x_admin_key)
+    body = b'{"statuses":' + token_service.bulk_status(request.device_ids) + b"}"
+    return Response(content=body, media_type="application/json")
@@ -0,0 +1,49 @@
+import hmac
+from fastapi import APIRouter, HTTPException, Header
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+from app.config import settings
+from app.api.v1.tts import engine_for
+from app.services import cluster, engines
+from app.services.audio_cache import audio_cache, synthesis_key
+
+router = APIRouter()
+
+class PeerFetchRequest(BaseModel):
+    model: str
+    voice: str
+    input: str
+    speed: float
+    response_format: str
+
+@router.post("/cache/fetch")
+async def fetch_cached_audio(
+    request: PeerFetchRequest,
+    x_cluster_secret: str = Header(None, alias=cluster.CLUSTER_SECRET_HEADER),
+    x_force_admit: str = Header(None, alias=cluster.FORCE_ADMIT_HEADER)
+):
+    """Serve audio this node owns to a peer, synthesizing it once on a miss."""
+    if cluster.ring is None or not settings.cluster_secret:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not x_cluster_secret or not hmac.compare_digest(x_cluster_secret, settings.cluster_secret):
+        raise HTTPException(status_code=401, detail="Invalid cluster secret")
+    
+    params = request.model_dump()
+    engine = engine_for(params)
+    if engine is None:
+        raise HTTPException(status_code=500, detail="TTS service not configured")
+    
+    async def synthesize() -> bytes:
+        return await engine.synthesize(params)
+    
+    try:
+        content, status = await audio_cache.get_or_create(
+            synthesis_key(params), synthesize, params, force=x_force_admit == "1"
+        )
+    except engines.EngineBusy:
+        raise HTTPException(status_code=503, detail="Synthesis engine busy, please retry", headers={"Retry-After": "1"})
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Failed to generate speech: {str(e)}")
+    
+    return Response(content, media_type="application/octet-stream", headers={"X-Cache": status.upper()})
@@ -1,7 +1,7 @@
-from fastapi import APIRouter, Header
+from fastapi import APIRouter, Header, Response
 from pydantic import BaseModel
 
-from app.services.token_service import TokenService
+from app.services import token_service
 
 router = APIRouter()
 
@@ -12,11 +12,18 @@ class TokenStatus(BaseModel):
     daily_free_used: int
     daily_free_limit: int
 
-@router.get("/status")
+@router.get("/status", response_model=TokenStatus)
 async def get_token_status(
-    x_device_id: str = Header(..., alias="X-Device-Id")
-) -> TokenStatus:
-    """Get token status for a device."""
-    token_service = TokenService()
-    status = await token_service.get_status(x_device_id)
-    return TokenStatus(**status)
+    x_device_id: str = Header(..., alias="X-Device-Id"),
+    if_none_match: str = Header(None, alias="If-None-Match")
+):
+    """Get token status for a device.
+
+    Served from a cached snapshot that changes only when the device's quota
+    does; a matching If-None-Match gets an empty 304.
+    """
+    body, etag = token_service.status_snapshot(x_device_id)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -1,4 +1,6 @@
 import os
+import hashlib
+from typing import Literal
 from fastapi import APIRouter, HTTPException, Header
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
@@ -6,6 +8,9 @@ from openai import OpenAI
 from prometheus_client import Counter
 
 from app.config import settings
+from app.services import cluster, engines, script_synthesis, shadow, tracing, upstream
+from app.services.audio_cache import audio_cache, synthesis_key
+from app.services.idempotency import IdempotencyConflict, idempotency_store
 from app.services.token_service import TokenService
 
 router = APIRouter()
@@ -16,6 +21,12 @@ tts_generations = Counter(
     ["tool", "voice"]
 )
 
+idempotent_replays = Counter(
+    "tts_idempotent_replays_total",
+    "Generations replayed from an Idempotency-Key",
+    ["tool"]
+)
+
 # Voice configurations mapped to OpenAI voices
 VOICES = {
     "james": {"openai_voice": "onyx", "name": "James", "gender": "male", "accent": "American"},
@@ -32,11 +43,37 @@ VOICES = {
     "carmen": {"openai_voice": "shimmer", "name": "Carmen", "gender": "female", "accent": "Spanish"},
 }
 
+# Output formats supported by the upstream speech API. pcm is raw 24kHz
+# 16-bit signed little-endian mono with no container.
+AUDIO_FORMATS = {
+    "mp3": {"media_type": "audio/mpeg", "extension": "mp3"},
+    "opus": {"media_type": "audio/ogg", "extension": "opus"},
+    "aac": {"media_type": "audio/aac", "extension": "aac"},
+    "flac": {"media_type": "audio/flac", "extension": "flac"},
+    "wav": {"media_type": "audio/wav", "extension": "wav"},
+    "pcm": {"media_type": "application/octet-stream", "extension": "pcm"},
+}
+
+# Quality levels mapped to upstream models. hd costs twice as much upstream
+# and is limited to premium devices.
+QUALITY_MODELS = {
+    "standard": "tts-1",
+    "hd": "tts-1-hd",
+}
+
+AudioFormat = Literal["mp3", "opus", "aac", "flac", "wav", "pcm"]
+Quality = Literal["standard", "hd"]
+
 class TTSRequest(BaseModel):
     text: str = Field(..., min_length=1, max_length=5000)
     voice: str = Field(default="emily")
     speed: float = Field(default=1.0, ge=0.5, le=2.0)
-    format: str = Field(default="mp3")
+    format: AudioFormat = Field(default="mp3")
+    quality: Quality = Field(default="standard")
+
+class ScriptRequest(TTSRequest):
+    # flac and Ogg opus segments cannot be spliced by concatenation
+    format: Literal["mp3", "aac", "wav", "pcm"] = Field(default="mp3")
 
 class VoiceInfo(BaseModel):
     id: str
@@ -52,47 +89,181 @@ async def list_voices():
         for vid, v in VOICES.items()
     ]
 
+def build_params(request: TTSRequest) -> dict:
+    """Map a validated request onto synthesis parameters.
+    
+    For the HTTP upstream these are the speech API kwargs. Local engines get
+    their engine name as ``model`` and the app voice id as ``voice``; formats
+    a local engine cannot produce fall back to its ``fallback_format``.
+    """
+    engine = engines.voice_engine(request.voice, VOICES)
+    audio_format = request.format
+    if engine != engines.HTTP_ENGINE:
+        model, voice = engine, request.voice
+        local = engines.local_engine(engine)
+        if local is not None and audio_format not in local.formats:
+            audio_format = local.fallback_format
+    else:
+        model, voice = QUALITY_MODELS[request.quality], VOICES[request.voice]["openai_voice"]
+    
+    return {
+        "model": model,
+        "voice": voice,
+        "input": request.text,
+        "speed": request.speed,
+        "response_format": audio_format,
+    }
+
+def get_tts_client() -> OpenAI | None:
+    api_key = settings.llm_proxy_key or settings.openai_api_key
+    base_url = settings.llm_proxy_url if settings.llm_proxy_key else settings.openai_base_url
+    
+    if not api_key:
+        return None
+    
+    provider = "proxy" if settings.llm_proxy_key else "openai"
+    return OpenAI(api_key=api_key, base_url=base_url, http_client=upstream.http_client(provider))
+
+def engine_for(params: dict, role: str = "primary") -> engines.SynthesisEngine | None:
+    """Return the engine that synthesizes ``params``, or None if it is not configured."""
+    local = engines.local_engine(params["model"])
+    if local is not None:
+        return local
+    if params["model"] not in QUALITY_MODELS.values():
+        # Names a local engine that is not configured
+        return None
+    
+    client = get_tts_client()
+    if client is None:
+        return None
+    return engines.HTTPEngine(client, role=role)
+
+async def warm_audio_cache():
+    """Synthesize the saved top-K hot phrases into the audio cache."""
+    if not settings.audio_cache_hot_file or settings.audio_cache_warm_top_k <= 0:
+        return
+    
+    for params in audio_cache.load_hot_phrases(settings.audio_cache_hot_file, settings.audio_cache_warm_top_k):
+        key = synthesis_key(params)
+        engine = engine_for(params)
+        if key in audio_cache or engine is None:
+            continue
+        try:
+            content = await engine.synthesize(params)
+        except Exception:
+            continue
+        audio_cache.put(key, content)
+
+def _stream_audio(trace, content: bytes):
+    try:
+        with trace.span("stream"):
+            yield content
+    finally:
+        trace.finish(status=200, bytes=len(content))
+
 @router.post("/generate")
 async def generate_speech(
     request: TTSRequest,
-    x_device_id: str = Header(..., alias="X-Device-Id")
+    x_device_id: str = Header(..., alias="X-Device-Id"),
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key", max_length=255)
 ):
-    """Generate speech from text using TTS API."""
+    """Generate speech from text using TTS API.
     
+    Retries carrying the same Idempotency-Key replay the stored result
+    without calling the upstream or consuming another generation.
+    """
+    trace = tracing.start_trace(
+        "tts.generate",
+        voice=request.voice,
+        format=request.format,
+        quality=request.quality,
+        chars=len(request.text)
+    )
+    try:
+        if idempotency_key is None:
+            result = await _generate_speech(trace, request, x_device_id)
+            return _audio_response(trace, result["format"], result["content"], result["headers"])
+        
+        fingerprint = hashlib.sha256(request.model_dump_json().encode()).hexdigest()
+        try:
+            result, replayed = await idempotency_store.run(
+                x_device_id, idempotency_key, fingerprint,
+                lambda: _generate_speech(trace, request, x_device_id)
+            )
+        except IdempotencyConflict:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+        
+        if replayed:
+            idempotent_replays.labels(tool=settings.tool_name).inc()
+        trace.attributes["replayed"] = replayed
+        return _audio_response(trace, result["format"], result["content"], {
+            **result["headers"],
+            "Idempotent-Replayed": "true" if replayed else "false",
+        })
+    except HTTPException as e:
+        trace.finish(status=e.status_code)
+        raise
+
+async def _prepare(trace, request: TTSRequest, x_device_id: str):
+    """Validate voice, check quota and pick the synthesis engine."""
     # Validate voice
-    if request.voice not in VOICES:
-        raise HTTPException(status_code=400, detail=f"Invalid voice. Available: {list(VOICES.keys())}")
+    with trace.span("voice"):
+        if request.voice not in VOICES:
+            raise HTTPException(status_code=400, detail=f"Invalid voice. Available: {list(VOICES.keys())}")
+        
+        # Map to engine, upstream voice and model
+        params = build_params(request)
     
     # Check token availability
-    token_service = TokenService()
-    if not await token_service.can_generate(x_device_id):
+    with trace.span("quota"):
+        token_service = TokenService()
+        can_generate = await token_service.can_generate(x_device_id)
+    if not can_generate:
         raise HTTPException(
             status_code=402,
             detail={"error": "No generations remaining. Please purchase more tokens.", "code": "payment_required"}
         )
+    if request.quality == "hd" and not await token_service.is_premium(x_device_id):
+        raise HTTPException(
+            status_code=402,
+            detail={"error": "HD quality is available with purchased tokens.", "code": "premium_required"}
+        )
     
-    # Get OpenAI voice mapping
-    voice_config = VOICES[request.voice]
-    openai_voice = voice_config["openai_voice"]
-    
-    # Initialize OpenAI client
-    api_key = settings.llm_proxy_key or settings.openai_api_key
-    base_url = settings.llm_proxy_url if settings.llm_proxy_key else settings.openai_base_url
-    
-    if not api_key:
+    engine = engine_for(params)
+    if engine is None:
         raise HTTPException(status_code=500, detail="TTS service not configured")
     
-    client = OpenAI(api_key=api_key, base_url=base_url)
+    return params, token_service, engine
+
+def _audio_response(trace, response_format: str, content: bytes, headers: dict):
+    audio_format = AUDIO_FORMATS[response_format]
+    return StreamingResponse(
+        _stream_audio(trace, content),
+        media_type=audio_format["media_type"],
+        headers={
+            "Content-Disposition": f"attachment; filename=murf-tts-audio.{audio_format['extension']}",
+            "Server-Timing": trace.server_timing(),
+            **headers,
+        }
+    )
+
+def _peer_http_error(e: cluster.PeerError) -> HTTPException:
+    """Pass a busy owner's 503 through; other peer failures are internal."""
+    if e.status_code == 503:
+        headers = {"Retry-After": e.retry_after} if e.retry_after else None
+        return HTTPException(status_code=503, detail=e.detail, headers=headers)
+    return HTTPException(status_code=502, detail="Failed to generate speech: cache peer error")
+
+async def _generate_speech(trace, request: TTSRequest, x_device_id: str):
+    params, token_service, engine = await _prepare(trace, request, x_device_id)
+    async def synthesize() -> bytes:
+        return await engine.synthesize(params, trace)
     
     try:
-        # Generate speech
-        response = client.audio.speech.create(
-            model="tts-1",
-            voice=openai_voice,
-            input=request.text,
-            speed=request.speed,
-            response_format=request.format
-        )
+        if isinstance(engine, engines.HTTPEngine):
+            shadow.maybe_mirror(params)
+        
+        content, cache_status = await cluster.get_or_create(synthesis_key(params), synthesize, params)
         
         # Consume token
         await token_service.use_generation(x_device_id)
@@ -100,13 +271,64 @@ async def generate_speech(
         # Track metric
         tts_generations.labels(tool=settings.tool_name, voice=request.voice).inc()
         
-        # Return audio stream
-        content_type = "audio/mpeg" if request.format == "mp3" else "audio/wav"
-        return StreamingResponse(
-            iter([response.content]),
-            media_type=content_type,
-            headers={"Content-Disposition": f"attachment; filename=murf-tts-audio.{request.format}"}
+        return {
+            "status_code": 200,
+            "content": content,
+            "format": params["response_format"],
+            "headers": {"X-Cache": cache_status.upper()},
+        }
+        
+    except engines.EngineBusy:
+        raise HTTPException(status_code=503, detail="Synthesis engine busy, please retry", headers={"Retry-After": "1"})
+    except cluster.PeerError as e:
+        raise _peer_http_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to generate speech: {str(e)}")
+
+@router.post("/script")
+async def generate_script(
+    request: ScriptRequest,
+    x_device_id: str = Header(..., alias="X-Device-Id")
+):
+    """Generate speech for a script, re-synthesizing only new or changed sentences."""
+    trace = tracing.start_trace(
+        "tts.script",
+        voice=request.voice,
+        format=request.format,
+        quality=request.quality,
+        chars=len(request.text)
+    )
+    try:
+        return await _generate_script(trace, request, x_device_id)
+    except HTTPException as e:
+        trace.finish(status=e.status_code)
+        raise
+
+async def _generate_script(trace, request: ScriptRequest, x_device_id: str):
+    params, token_service, engine = await _prepare(trace, request, x_device_id)
+    del params["input"]
+    
+    async def synthesize(sentence_params: dict) -> bytes:
+        return await engine.synthesize(sentence_params, trace)
+    
+    try:
+        result = await script_synthesis.synthesize_script(
+            request.text, params, synthesize, settings.script_max_concurrency
         )
         
+        # A script counts as a single generation
+        await token_service.use_generation(x_device_id)
+        tts_generations.labels(tool=settings.tool_name, voice=request.voice).inc()
+        
+        trace.attributes.update(sentences=result["sentences"], reused=result["reused"])
+        return _audio_response(trace, params["response_format"], result["audio"], {
+            "X-Sentences-Total": str(result["sentences"]),
+            "X-Sentences-Reused": str(result["reused"]),
+        })
+        
+    except engines.EngineBusy:
+        raise HTTPException(status_code=503, detail="Synthesis engine busy, please retry", headers={"Retry-After": "1"})
+    except cluster.PeerError as e:
+        raise _peer_http_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate speech: {str(e)}")
@@ -0,0 +1,208 @@
+"""Command line tools.
+
+    python -m app.cli synth lines.csv --out audio/ [--concurrency 8]
+
+``synth`` reads a CSV or JSONL manifest with one line per row (``text`` is
+required; ``id``, ``voice``, ``speed``, ``format`` and ``quality`` are
+optional) and writes one audio file per row. Finished rows are recorded in
+``<out>/progress.jsonl`` with their synthesis key, so an interrupted run
+resumes where it stopped and rows whose text or settings changed are
+synthesized again.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import re
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from app.api.v1 import tts
+from app.services import engines
+from app.services.audio_cache import audio_cache, synthesis_key
+
+PROGRESS_FILE = "progress.jsonl"
+
+
+def safe_id(row_id: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", row_id).strip("._") or "item"
+
+
+def read_manifest(path: str) -> List[Dict[str, Any]]:
+    """Read manifest rows; raises ValueError on ids that collide as file names."""
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.endswith(".jsonl"):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+
+    seen: Dict[str, str] = {}
+    for n, row in enumerate(rows, start=1):
+        row["id"] = str(row.get("id") or n)
+        name = safe_id(row["id"])
+        if name in seen:
+            raise ValueError(f"Duplicate id {row['id']!r} (row {n}) collides with {seen[name]!r}")
+        seen[name] = row["id"]
+        # Empty CSV cells fall back to the request defaults
+        for field in ["voice", "speed", "format", "quality"]:
+            if row.get(field) in ("", None):
+                row.pop(field, None)
+    return rows
+
+
+def build_row(row: Dict[str, Any]) -> Tuple[tts.TTSRequest, Dict[str, Any]]:
+    """Validate a manifest row into a request and its synthesis params."""
+    request = tts.TTSRequest(**{k: v for k, v in row.items() if k != "id"})
+    if request.voice not in tts.VOICES:
+        raise ValueError(f"Invalid voice: {request.voice}")
+    return request, tts.build_params(request)
+
+
+def row_key(row: Dict[str, Any]) -> Optional[str]:
+    try:
+        _, params = build_row(row)
+    except (ValidationError, ValueError):
+        return None
+    return synthesis_key(params)
+
+
+def read_progress(out_dir: str) -> Dict[str, str]:
+    """Return id -> synthesis key for rows recorded as done whose output file still exists."""
+    done: Dict[str, str] = {}
+    try:
+        with open(os.path.join(out_dir, PROGRESS_FILE), encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A run killed mid-write can leave a partial last line
+                    continue
+                if "key" in entry and os.path.exists(os.path.join(out_dir, entry["file"])):
+                    done[entry["id"]] = entry["key"]
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def output_name(row_id: str, audio_format: str) -> str:
+    return f"{safe_id(row_id)}.{tts.AUDIO_FORMATS[audio_format]['extension']}"
+
+
+def write_atomic(path: str, content: bytes):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class BulkSynthesizer:
+    def __init__(self, out_dir: str, concurrency: int, retries: int):
+        self.out_dir = out_dir
+        self.retries = retries
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.progress = open(os.path.join(out_dir, PROGRESS_FILE), "a", encoding="utf-8")
+        self.completed = 0
+        self.chars = 0
+        self.bytes = 0
+        self.failures: List[Dict[str, str]] = []
+
+    def close(self):
+        self.progress.close()
+
+    async def _synthesize(self, engine, params: Dict[str, Any]) -> bytes:
+        for attempt in range(self.retries + 1):
+            try:
+                return await engine.synthesize(params)
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                await asyncio.sleep(2 ** attempt)
+
+    async def run_one(self, row: Dict[str, Any]):
+        row_id = row["id"]
+        try:
+            request, params = build_row(row)
+        except (ValidationError, ValueError) as e:
+            self.failures.append({"id": row_id, "error": str(e).splitlines()[0]})
+            return
+
+        key = synthesis_key(params)
+        engine = tts.engine_for(params, role="bulk")
+        if engine is None:
+            self.failures.append({"id": row_id, "error": f"Synthesis engine not configured: {params['model']}"})
+            return
+        async with self.semaphore:
+            try:
+                # Repeated lines in a manifest are synthesized once
+                content, _ = await audio_cache.get_or_create(
+                    key, lambda: self._synthesize(engine, params), params
+                )
+            except Exception as e:
+                self.failures.append({"id": row_id, "error": str(e)})
+                return
+
+        name = output_name(row_id, params["response_format"])
+        write_atomic(os.path.join(self.out_dir, name), content)
+        self.progress.write(json.dumps({"id": row_id, "file": name, "bytes": len(content), "key": key}) + "\n")
+        self.progress.flush()
+        self.completed += 1
+        self.chars += len(request.text)
+        self.bytes += len(content)
+
+
+async def synth(args) -> int:
+    try:
+        rows = read_manifest(args.manifest)
+    except ValueError as e:
+        print(f"invalid manifest: {e}", file=sys.stderr)
+        return 2
+
+    os.makedirs(args.out, exist_ok=True)
+    done = read_progress(args.out)
+    # Rows are done only if their id was written with the same text and settings
+    pending = [row for row in rows if row_key(row) is None or done.get(row["id"]) != row_key(row)]
+    print(f"{len(rows)} items, {len(rows) - len(pending)} already done, {len(pending)} to synthesize")
+
+    bulk = BulkSynthesizer(args.out, args.concurrency, args.retries)
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*[bulk.run_one(row) for row in pending])
+    finally:
+        bulk.close()
+        engines.shutdown()
+    elapsed = max(time.perf_counter() - start, 1e-9)
+
+    print(
+        f"done: {bulk.completed}  failed: {len(bulk.failures)}  time: {elapsed:.1f}s  "
+        f"throughput: {bulk.completed / elapsed:.2f} items/s, {bulk.chars / elapsed:.0f} chars/s, "
+        f"{bulk.bytes / elapsed / 1024:.0f} KiB/s"
+    )
+    for failure in bulk.failures:
+        print(f"  failed {failure['id']}: {failure['error']}", file=sys.stderr)
+    return 1 if bulk.failures else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    synth_parser = commands.add_parser("synth", help="synthesize every line of a CSV/JSONL manifest")
+    synth_parser.add_argument("manifest", help="input .csv or .jsonl")
+    synth_parser.add_argument("--out", required=True, help="output directory")
+    synth_parser.add_argument("--concurrency", type=int, default=4)
+    synth_parser.add_argument("--retries", type=int, default=2)
+
+    args = parser.parse_args(argv)
+    if args.command == "synth":
+        return asyncio.run(synth(args))
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -23,6 +23,59 @@ class Settings(BaseSettings):
     
     # Free tier
     free_generations_per_day: int = 5
+    status_cache_max_entries: int = 100000
+    
+    # Audio cache (max_bytes 0 disables caching)
+    audio_cache_max_bytes: int = 64 * 1024 * 1024
+    audio_cache_policy: str = "tinylfu"
+    audio_cache_sketch_width: int = 16384
+    audio_cache_hot_file: str = ""
+    audio_cache_warm_top_k: int = 0
+    
+    # Script synthesis: concurrent upstream calls per script
+    script_max_concurrency: int = 4
+    
+    # Idempotency-Key replay store
+    idempotency_ttl_seconds: int = 3600
+    idempotency_max_entries: int = 10000
+    idempotency_max_bytes: int = 32 * 1024 * 1024
+    
+    # Shadow traffic: mirror a sample of /generate to another provider/model.
+    # shadow_provider is "proxy" or "openai" (empty = same as primary).
+    shadow_sample_rate: float = 0.0
+    shadow_provider: str = ""
+    shadow_model: str = ""
+    shadow_max_concurrency: int = 2
+    
+    # Cluster: comma-separated peer base URLs including this node's own URL
+    cluster_peers: str = ""
+    cluster_self_url: str = ""
+    cluster_secret: str = ""
+    cluster_vnodes: int = 128
+    cluster_peer_timeout: float = 30.0
+    
+    # Local synthesis engines run in worker processes, as JSON:
+    # {"cpu": {"target": "module:function", "workers": 2, "queue_limit": 16}}
+    local_engines: str = "{}"
+    local_engine_workers: int = 2
+    local_engine_queue_limit: int = 16
+    # Voice id -> engine name, overriding the VOICES default of "openai".
+    # Local engines produce pcm/wav; other requested formats are served as wav.
+    voice_engines: str = "{}"
+    
+    # Admin / debugging
+    admin_api_key: str = ""
+    profiling_enabled: bool = False
+    profiling_secret: str = ""
+    profiling_sample_every: int = 0
+    profiling_dir: str = "./data/profiles"
+    profiling_max_files: int = 200
+    tracemalloc_enabled: bool = False
+    tracemalloc_frames: int = 25
+    
+    # Tracing: "" disables export, "stdout" or a file path for JSON lines
+    trace_export: str = ""
+    trace_sample_rate: float = 1.0
     
     class Config:
         env_file = ".env"
@@ -1,10 +1,15 @@
 import os
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import Response
 from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
 
-from app.api.v1 import tts, tokens, payment
+from app.api.v1 import tts, tokens, payment, admin, internal
+from app.config import settings
+from app.services import cluster, engines, profiling, shadow, upstream
+from app.services.audio_cache import audio_cache
 
 TOOL_NAME = os.getenv("TOOL_NAME", "murf-tts")
 
@@ -32,10 +37,24 @@ crawler_visits = Counter(
     ["tool", "bot"]
 )
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    shadow.validate()
+    engines.validate()
+    warm_task = asyncio.create_task(tts.warm_audio_cache())
+    yield
+    warm_task.cancel()
+    await cluster.close()
+    engines.shutdown()
+    upstream.close()
+    if settings.audio_cache_hot_file:
+        audio_cache.save_hot_phrases(settings.audio_cache_hot_file, max(settings.audio_cache_warm_top_k, 100))
+
 app = FastAPI(
     title="Murf TTS API",
     description="Professional AI Voice Generator - Murf.ai Alternative",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS
@@ -73,10 +92,19 @@ async def track_requests(request: Request, call_next):
     
     return response
 
+# Opt-in profiling; not registered at all when disabled
+if settings.profiling_enabled:
+    app.middleware("http")(profiling.profile_requests)
+
+if settings.tracemalloc_enabled:
+    profiling.start_tracemalloc()
+
 # Include routers
 app.include_router(tts.router, prefix="/api/v1/tts", tags=["TTS"])
 app.include_router(tokens.router, prefix="/api/v1/tokens", tags=["Tokens"])
 app.include_router(payment.router, prefix="/api/v1/payment", tags=["Payment"])
+app.include_router(admin.router, prefix="/api/v1/admin", tags=["Admin"])
+app.include_router(internal.router, prefix="/api/v1/internal", tags=["Internal"])
 
 @app.get("/")
 async def root():
@@ -0,0 +1,285 @@
+import asyncio
+import hashlib
+import json
+import os
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.config import settings
+
+
+def synthesis_key(params: Dict[str, Any]) -> str:
+    """Canonical cache key for a set of upstream synthesis parameters.
+
+    ``params`` are the upstream request kwargs (model, voice, input, speed,
+    response_format), so app voices that share an upstream voice share
+    cache entries.
+    """
+    canonical = dict(params)
+    canonical["input"] = unicodedata.normalize("NFC", canonical["input"]).strip()
+    canonical["speed"] = round(float(canonical.get("speed", 1.0)), 2)
+    payload = json.dumps(canonical, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class FrequencySketch:
+    """Count-min sketch with 4-bit saturating counters and periodic aging.
+
+    After ``sample_size`` increments every counter is halved, so estimates
+    track recent popularity rather than all-time totals.
+    """
+
+    MAX_COUNT = 15
+
+    def __init__(self, width: int = 16384, depth: int = 4, sample_size: Optional[int] = None):
+        self.width = 1 << max(0, width - 1).bit_length()
+        self.depth = depth
+        self.sample_size = sample_size or 10 * self.width
+        self.additions = 0
+        self._rows = [bytearray(self.width) for _ in range(depth)]
+
+    def _indexes(self, key: str) -> List[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=4 * self.depth).digest()
+        mask = self.width - 1
+        return [
+            int.from_bytes(digest[i * 4:(i + 1) * 4], "little") & mask
+            for i in range(self.depth)
+        ]
+
+    def estimate(self, key: str) -> int:
+        return min(row[i] for row, i in zip(self._rows, self._indexes(key)))
+
+    def increment(self, key: str, count: int = 1):
+        indexes = self._indexes(key)
+        current = min(row[i] for row, i in zip(self._rows, indexes))
+        target = min(current + count, self.MAX_COUNT)
+        if target == current:
+            return
+
+        # Conservative update: only raise counters that are below the new estimate
+        for row, i in zip(self._rows, indexes):
+            if row[i] < target:
+                row[i] = target
+
+        self.additions += count
+        if self.additions >= self.sample_size:
+            self._age()
+
+    def _age(self):
+        for n, row in enumerate(self._rows):
+            self._rows[n] = bytearray(c >> 1 for c in row)
+        self.additions //= 2
+
+    def clear(self):
+        self.additions = 0
+        self._rows = [bytearray(self.width) for _ in range(self.depth)]
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one execution.
+
+    The work runs as its own task, so cancelling the caller that started it
+    (e.g. a client disconnect) does not cancel it for the others waiting.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Any, asyncio.Task] = {}
+
+    async def do(self, key: Any, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Run ``fn`` or wait for the in-flight call; the flag is True when shared."""
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending), True
+
+        task = asyncio.ensure_future(fn())
+        self._inflight[key] = task
+
+        def done(task: asyncio.Task):
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+            # Mark retrieved so a failure nobody awaits doesn't log a warning
+            if not task.cancelled():
+                task.exception()
+
+        task.add_done_callback(done)
+        return await asyncio.shield(task), False
+
+
+class AudioCache:
+    """Byte-bounded LRU of synthesized audio with an optional TinyLFU admission policy.
+
+    With ``policy="tinylfu"`` a new entry only displaces residents when the
+    sketch says it has been requested more often than each of them, so
+    one-off texts cannot flush popular phrases. ``policy="lru"`` always
+    admits.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        policy: str = "tinylfu",
+        sketch: Optional[FrequencySketch] = None,
+        hot_capacity: int = 256,
+    ):
+        if policy not in ("lru", "tinylfu"):
+            raise ValueError(f"Unknown cache policy: {policy}")
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.sketch = sketch or FrequencySketch()
+        self.hot_capacity = hot_capacity
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.rejections = 0
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._hot: Dict[str, Dict[str, Any]] = {}
+        self._flights = SingleFlight()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def record(self, key: str, meta: Optional[Dict[str, Any]] = None):
+        """Count an access in the sketch and the hot-phrase list."""
+        self.sketch.increment(key)
+        if meta is None or key in self._hot:
+            return
+
+        if len(self._hot) < self.hot_capacity:
+            self._hot[key] = meta
+            return
+
+        coldest = min(self._hot, key=self.sketch.estimate)
+        if self.sketch.estimate(key) > self.sketch.estimate(coldest):
+            del self._hot[coldest]
+            self._hot[key] = meta
+
+    def get(self, key: str, meta: Optional[Dict[str, Any]] = None) -> Optional[bytes]:
+        self.record(key, meta)
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: bytes, force: bool = False) -> bool:
+        """Insert ``value``; returns False if the admission policy rejected it.
+
+        ``force`` skips the admission check, for entries that are known to
+        be reused soon (script sentences) but have no frequency history yet.
+        """
+        resident = key in self._entries
+        if resident:
+            self.size -= len(self._entries.pop(key))
+
+        if len(value) > self.max_bytes:
+            return False
+
+        victims = []
+        freed = 0
+        for victim in self._entries:
+            if self.size - freed + len(value) <= self.max_bytes:
+                break
+            victims.append(victim)
+            freed += len(self._entries[victim])
+
+        if victims and self.policy == "tinylfu" and not resident and not force:
+            candidate = self.sketch.estimate(key)
+            if any(candidate <= self.sketch.estimate(v) for v in victims):
+                self.rejections += 1
+                return False
+
+        for victim in victims:
+            self.size -= len(self._entries.pop(victim))
+
+        self._entries[key] = value
+        self.size += len(value)
+        return True
+
+    async def get_or_create(
+        self,
+        key: str,
+        create: Callable[[], Awaitable[bytes]],
+        meta: Optional[Dict[str, Any]] = None,
+        force: bool = False,
+    ) -> Tuple[bytes, str]:
+        """Return cached audio or synthesize it once for all concurrent callers.
+
+        The second element is "hit", "shared" (joined an in-flight
+        synthesis) or "miss". ``force`` is passed on to put().
+        """
+        value = self.get(key, meta)
+        if value is not None:
+            return value, "hit"
+
+        async def create_and_store() -> bytes:
+            value = await create()
+            self.put(key, value, force)
+            return value
+
+        value, shared = await self._flights.do(key, create_and_store)
+        return value, "shared" if shared else "miss"
+
+    def hot_phrases(self, limit: int = 20) -> List[Dict[str, Any]]:
+        ranked = sorted(self._hot.items(), key=lambda item: self.sketch.estimate(item[0]), reverse=True)
+        return [
+            {"key": key, "estimate": self.sketch.estimate(key), "cached": key in self._entries, "params": meta}
+            for key, meta in ranked[:limit]
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "policy": self.policy,
+            "entries": len(self._entries),
+            "size_bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "rejections": self.rejections,
+        }
+
+    def save_hot_phrases(self, path: str, limit: int):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.hot_phrases(limit), f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def load_hot_phrases(self, path: str, limit: int) -> List[Dict[str, Any]]:
+        """Seed the sketch and hot list from a saved report; returns the params to warm."""
+        try:
+            with open(path, encoding="utf-8") as f:
+                phrases = json.load(f)
+        except (OSError, ValueError):
+            return []
+
+        params = []
+        for phrase in phrases[:limit]:
+            key = synthesis_key(phrase["params"])
+            self.sketch.increment(key, phrase.get("estimate", 1))
+            self._hot[key] = phrase["params"]
+            params.append(phrase["params"])
+        return params
+
+    def clear(self):
+        self._entries.clear()
+        self._hot.clear()
+        self.sketch.clear()
+        self.size = self.hits = self.misses = self.rejections = 0
+
+
+audio_cache = AudioCache(
+    max_bytes=settings.audio_cache_max_bytes,
+    policy=settings.audio_cache_policy,
+    sketch=FrequencySketch(width=settings.audio_cache_sketch_width),
+)
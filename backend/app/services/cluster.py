@@ -0,0 +1,147 @@
+import bisect
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.config import settings
+from app.services.audio_cache import SingleFlight, audio_cache
+
+logger = logging.getLogger(__name__)
+
+PEER_FETCH_PATH = "/api/v1/internal/cache/fetch"
+CLUSTER_SECRET_HEADER = "X-Cluster-Secret"
+# Asks the owner to bypass cache admission (AudioCache.put force)
+FORCE_ADMIT_HEADER = "X-Cache-Force-Admit"
+
+
+class PeerError(Exception):
+    """The owner node answered with an error status."""
+
+    def __init__(self, owner: str, status_code: int, detail: Any, retry_after: Optional[str] = None):
+        super().__init__(f"{owner} returned {status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes.
+
+    Adding or removing a node only moves the keys that hash next to its
+    virtual nodes; everything else keeps its owner.
+    """
+
+    def __init__(self, nodes: List[str], vnodes: int = 128):
+        if not nodes:
+            raise ValueError("HashRing needs at least one node")
+        self.nodes = sorted(set(nodes))
+        points = sorted(
+            (_hash(f"{node}#{i}"), node)
+            for node in self.nodes
+            for i in range(vnodes)
+        )
+        self._hashes = [h for h, _ in points]
+        self._owners = [node for _, node in points]
+
+    def owner(self, key: str) -> str:
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._owners[index]
+
+
+def parse_peers(value: str) -> List[str]:
+    return [peer.strip().rstrip("/") for peer in value.split(",") if peer.strip()]
+
+
+def build_ring() -> Optional[HashRing]:
+    peers = parse_peers(settings.cluster_peers)
+    if not peers or not settings.cluster_self_url:
+        return None
+    if not settings.cluster_secret:
+        # Owners would answer every peer fetch with 404
+        logger.error("CLUSTER_PEERS is set but CLUSTER_SECRET is empty; cluster cache disabled")
+        return None
+    return HashRing(peers, settings.cluster_vnodes)
+
+
+ring = build_ring()
+_peer_flights = SingleFlight()
+_client: Optional[httpx.AsyncClient] = None
+
+
+def self_url() -> str:
+    return settings.cluster_self_url.rstrip("/")
+
+
+def owner_for(key: str) -> Optional[str]:
+    """Return the peer URL that owns ``key``, or None when this node owns it."""
+    if ring is None:
+        return None
+    owner = ring.owner(key)
+    return None if owner == self_url() else owner
+
+
+def _get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(timeout=settings.cluster_peer_timeout)
+    return _client
+
+
+async def fetch_from_peer(owner: str, params: Dict[str, Any], force: bool = False) -> Tuple[bytes, str]:
+    headers = {CLUSTER_SECRET_HEADER: settings.cluster_secret}
+    if force:
+        headers[FORCE_ADMIT_HEADER] = "1"
+    response = await _get_client().post(f"{owner}{PEER_FETCH_PATH}", json=params, headers=headers)
+    if response.is_error:
+        try:
+            detail = response.json().get("detail", response.text)
+        except ValueError:
+            detail = response.text
+        if response.status_code in (401, 404):
+            logger.error("Peer %s rejected cache fetch (%s); check CLUSTER_SECRET and CLUSTER_PEERS", owner, response.status_code)
+        raise PeerError(owner, response.status_code, detail, response.headers.get("Retry-After"))
+    return response.content, response.headers.get("X-Cache", "miss").lower()
+
+
+async def get_or_create(
+    key: str,
+    create: Callable[[], Awaitable[bytes]],
+    params: Dict[str, Any],
+    force: bool = False,
+) -> Tuple[bytes, str]:
+    """Serve ``key`` from its owner node's cache, synthesizing there on a miss.
+
+    Keys owned by this node (or all keys when no cluster is configured) go
+    through the local audio cache. Other keys are fetched from the owner,
+    which runs the single-flight synthesis. If the owner cannot be connected
+    to the audio is synthesized locally. Error responses and failures after
+    connecting (the owner may still be synthesizing) raise PeerError rather
+    than paying for the same audio again here.
+    ``force`` skips cache admission wherever the audio is stored.
+    """
+    owner = owner_for(key)
+    if owner is None:
+        return await audio_cache.get_or_create(key, create, params, force)
+
+    try:
+        (content, status), shared = await _peer_flights.do(key, lambda: fetch_from_peer(owner, params, force))
+    except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+        logger.warning("Peer fetch from %s failed, synthesizing locally: %s", owner, e)
+        return await audio_cache.get_or_create(key, create, params, force)
+    except httpx.TransportError as e:
+        raise PeerError(owner, 502, str(e)) from e
+
+    return content, "shared" if shared else f"peer-{status}"
+
+
+async def close():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
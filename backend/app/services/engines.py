@@ -0,0 +1,269 @@
+import abc
+import asyncio
+import importlib
+import io
+import json
+import logging
+import math
+import multiprocessing
+import time
+import wave
+from concurrent.futures import Future, InvalidStateError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import nullcontext
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Callable, Dict, FrozenSet, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.services import upstream
+
+logger = logging.getLogger(__name__)
+
+HTTP_ENGINE = "openai"
+PCM_SAMPLE_RATE = 24000
+
+
+class EngineBusy(Exception):
+    """The engine's queue is full."""
+
+
+class SynthesisEngine(abc.ABC):
+    """Turns upstream-style params (voice, input, speed, response_format) into audio bytes."""
+
+    name = ""
+    formats: FrozenSet[str] = frozenset()
+    # Served instead of a requested format the engine cannot produce
+    fallback_format = "mp3"
+
+    @abc.abstractmethod
+    async def synthesize(self, params: Dict[str, Any], trace=None) -> bytes:
+        ...
+
+
+def _span(trace, stage: str):
+    return trace.span(stage) if trace is not None else nullcontext()
+
+
+class HTTPEngine(SynthesisEngine):
+    """The OpenAI-compatible speech API. Cheap to build, one per request."""
+
+    name = HTTP_ENGINE
+    formats = frozenset(["mp3", "opus", "aac", "flac", "wav", "pcm"])
+
+    def __init__(self, client, provider: Optional[str] = None, role: str = "primary"):
+        self.client = client
+        self.provider = provider or upstream.primary_provider()
+        self.role = role
+
+    async def synthesize(self, params: Dict[str, Any], trace=None) -> bytes:
+        queued_at = time.perf_counter()
+
+        def call() -> bytes:
+            # Time spent waiting for a worker thread is reported as upstream_queue
+            if trace is not None:
+                trace.record("upstream_queue", time.perf_counter() - queued_at)
+            with _span(trace, "upstream"):
+                return upstream.call_speech(self.client, self.provider, self.role, **params).content
+
+        return await run_in_threadpool(call)
+
+
+_worker_targets: Dict[str, Callable[..., bytes]] = {}
+
+
+def _load_target(target: str) -> Callable[..., bytes]:
+    if target not in _worker_targets:
+        module, _, attr = target.partition(":")
+        _worker_targets[target] = getattr(importlib.import_module(module), attr)
+    return _worker_targets[target]
+
+
+def _run_in_worker(target: str, text: str, voice: str, speed: float) -> Tuple[Optional[str], int]:
+    """Run a local engine and hand its PCM back through shared memory.
+
+    Returns the segment name and size; the parent copies it out and unlinks
+    it, so large audio never goes through the result pipe.
+    """
+    pcm = _load_target(target)(text, voice, speed)
+    if not pcm:
+        return None, 0
+
+    shm = shared_memory.SharedMemory(create=True, size=len(pcm))
+    shm.buf[:len(pcm)] = pcm
+    # Ownership passes to the parent, which unlinks the segment
+    resource_tracker.unregister(shm._name, "shared_memory")
+    shm.close()
+    return shm.name, len(pcm)
+
+
+def _read_shared(name: Optional[str], size: int) -> bytes:
+    if name is None:
+        return b""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        return bytes(shm.buf[:size])
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _collect_shared(worker: Future, pcm: Future):
+    """Done-callback on the worker future: copy the segment out and unlink it.
+
+    Runs whether or not anyone still awaits ``pcm``, so a cancelled request
+    or a pool shutdown cannot leak the segment in /dev/shm.
+    """
+    if worker.cancelled():
+        pcm.cancel()
+        return
+    try:
+        outcome, set_outcome = _read_shared(*worker.result()), pcm.set_result
+    except Exception as e:
+        outcome, set_outcome = e, pcm.set_exception
+    try:
+        set_outcome(outcome)
+    except InvalidStateError:
+        # The caller was cancelled; the segment is already unlinked
+        pass
+
+
+def pcm_to_wav(pcm: bytes) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(PCM_SAMPLE_RATE)
+        w.writeframes(pcm)
+    return buffer.getvalue()
+
+
+class ProcessPoolEngine(SynthesisEngine):
+    """Runs a CPU-bound local engine in worker processes.
+
+    ``target`` is a "module:function" taking (text, voice, speed) and
+    returning 24kHz 16-bit mono PCM. At most ``workers`` syntheses run at
+    once and ``queue_limit`` more may wait; beyond that EngineBusy is raised
+    instead of queueing without bound.
+    """
+
+    formats = frozenset(["pcm", "wav"])
+    fallback_format = "wav"
+
+    def __init__(self, name: str, target: str, workers: int = 2, queue_limit: int = 16):
+        self.name = name
+        self.target = target
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.pending = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process that runs an event loop and threads is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    async def synthesize(self, params: Dict[str, Any], trace=None) -> bytes:
+        if self.pending >= self.workers + self.queue_limit:
+            raise EngineBusy(self.name)
+
+        self.pending += 1
+        pool = self._get_pool()
+        try:
+            with _span(trace, "engine"):
+                worker = pool.submit(
+                    _run_in_worker, self.target, params["input"], params["voice"], params.get("speed", 1.0)
+                )
+                result: Future = Future()
+                # Cancelling the request cancels work that has not started yet
+                result.add_done_callback(lambda f: f.cancelled() and worker.cancel())
+                worker.add_done_callback(lambda f: _collect_shared(f, result))
+                pcm = await asyncio.wrap_future(result)
+        except BrokenProcessPool:
+            # A worker died (crash, OOM kill); the pool is unusable, so the
+            # next request starts a fresh one
+            if self._pool is pool:
+                self.shutdown()
+            raise
+        finally:
+            self.pending -= 1
+
+        if params["response_format"] == "wav":
+            return pcm_to_wav(pcm)
+        return pcm
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def stub_engine(text: str, voice: str, speed: float) -> bytes:
+    """Deterministic stand-in for a local TTS engine: a tone per character."""
+    samples_per_char = int(PCM_SAMPLE_RATE * 0.05 / speed)
+    frequency = 220 + (sum(voice.encode()) % 8) * 55
+    out = bytearray()
+    for n in range(samples_per_char * len(text)):
+        value = int(8000 * math.sin(2 * math.pi * frequency * n / PCM_SAMPLE_RATE))
+        out += value.to_bytes(2, "little", signed=True)
+    return bytes(out)
+
+
+_local_engines: Optional[Dict[str, ProcessPoolEngine]] = None
+
+
+def _parse_json_setting(value: str) -> Dict[str, Any]:
+    # Invalid values are reported once by validate()
+    try:
+        return json.loads(value) if value else {}
+    except ValueError:
+        return {}
+
+
+def validate():
+    """Check engine settings once at startup and log what would break routing."""
+    for name in ["local_engines", "voice_engines"]:
+        try:
+            json.loads(getattr(settings, name) or "{}")
+        except ValueError as e:
+            logger.error("%s is not valid JSON and is ignored: %s", name.upper(), e)
+
+    configured = set(local_engines()) | {HTTP_ENGINE}
+    for voice, engine in _parse_json_setting(settings.voice_engines).items():
+        if engine not in configured:
+            logger.error("VOICE_ENGINES routes %s to unconfigured engine %s", voice, engine)
+
+
+def local_engines() -> Dict[str, ProcessPoolEngine]:
+    """Engines from ``local_engines``: {"name": {"target": "module:function"}}."""
+    global _local_engines
+    if _local_engines is None:
+        _local_engines = {
+            name: ProcessPoolEngine(
+                name,
+                config["target"],
+                workers=config.get("workers", settings.local_engine_workers),
+                queue_limit=config.get("queue_limit", settings.local_engine_queue_limit),
+            )
+            for name, config in _parse_json_setting(settings.local_engines).items()
+        }
+    return _local_engines
+
+
+def local_engine(name: str) -> Optional[ProcessPoolEngine]:
+    return local_engines().get(name)
+
+
+def voice_engine(voice_id: str, voices: Dict[str, Dict[str, Any]]) -> str:
+    """Engine for a voice: ``voice_engines`` overrides, then the VOICES entry."""
+    overrides = _parse_json_setting(settings.voice_engines)
+    return overrides.get(voice_id) or voices[voice_id].get("engine", HTTP_ENGINE)
+
+
+def shutdown():
+    for engine in (_local_engines or {}).values():
+        engine.shutdown()
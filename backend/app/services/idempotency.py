@@ -0,0 +1,104 @@
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from app.config import settings
+from app.services.audio_cache import SingleFlight
+
+
+class IdempotencyConflict(Exception):
+    """An idempotency key was reused with a different request."""
+
+
+class IdempotencyStore:
+    """Memory-bounded store of completed results keyed by (device, idempotency key).
+
+    Only successful results are stored, so a failed attempt can be retried
+    with the same key. Concurrent requests with a key that is still in flight
+    wait for the original and receive its result (or its error).
+    Stored audio is the same bytes object held by the audio cache, so a
+    record costs no extra copy while the cache still holds it.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._records: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str], str] = {}
+        self._flights = SingleFlight()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def _expire(self, now: float):
+        # Records share one TTL, so insertion order is expiry order
+        while self._records:
+            scope, record = next(iter(self._records.items()))
+            if record["expires_at"] > now:
+                break
+            self._drop(scope)
+
+    def _drop(self, scope: Tuple[str, str]):
+        record = self._records.pop(scope)
+        self.size -= len(record["content"])
+
+    def _store(self, scope: Tuple[str, str], fingerprint: str, result: Dict[str, Any]):
+        content = result["content"]
+        if len(content) > self.max_bytes:
+            return
+
+        self._records[scope] = {**result, "fingerprint": fingerprint, "expires_at": time.monotonic() + self.ttl}
+        self.size += len(content)
+        while len(self._records) > self.max_entries or self.size > self.max_bytes:
+            self._drop(next(iter(self._records)))
+
+    async def run(
+        self,
+        device_id: str,
+        key: str,
+        fingerprint: str,
+        fn: Callable[[], Awaitable[Dict[str, Any]]],
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Return the stored result for the key or run ``fn`` once.
+
+        ``fn`` returns a dict with ``status_code``, ``content`` and
+        ``headers``. The flag is True when the result was replayed.
+        """
+        scope = (device_id, key)
+        self._expire(time.monotonic())
+
+        record = self._records.get(scope)
+        if record is not None:
+            if record["fingerprint"] != fingerprint:
+                raise IdempotencyConflict(key)
+            return record, True
+
+        inflight_fingerprint = self._inflight.get(scope)
+        if inflight_fingerprint is not None and inflight_fingerprint != fingerprint:
+            raise IdempotencyConflict(key)
+
+        async def run_and_store() -> Dict[str, Any]:
+            try:
+                result = await fn()
+            finally:
+                del self._inflight[scope]
+            self._store(scope, fingerprint, result)
+            return result
+
+        # Set before the flight task starts so a conflicting request arriving
+        # in between is still rejected
+        self._inflight.setdefault(scope, fingerprint)
+        return await self._flights.do(scope, run_and_store)
+
+    def clear(self):
+        self._records.clear()
+        self.size = 0
+
+
+idempotency_store = IdempotencyStore(
+    ttl=settings.idempotency_ttl_seconds,
+    max_entries=settings.idempotency_max_entries,
+    max_bytes=settings.idempotency_max_bytes,
+)
@@ -0,0 +1,167 @@
+import cProfile
+import hashlib
+import hmac
+import itertools
+import os
+import re
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+from fastapi import Request
+
+from app.config import settings
+
+PROFILE_HEADER = "X-Profile-Signature"
+SIGNATURE_MAX_AGE = 300
+
+# Source files whose allocations are reported under a named subsystem.
+# Paths are matched as suffixes of the traceback frame filename.
+SUBSYSTEMS: Dict[str, str] = {
+    "app/services/token_service.py": "_device_tokens",
+    "app/api/v1/tts.py": "audio_buffers",
+    "app/services/engines.py": "audio_buffers",
+    "app/services/upstream.py": "audio_buffers",
+    "app/services/audio_cache.py": "caches",
+}
+
+_request_counter = itertools.count(1)
+
+# Only one cProfile profiler can be active per thread (a second enable()
+# raises on 3.12 and silently replaces the first on earlier versions).
+_profiling_active = False
+
+
+def sign_profile_request(secret: str, method: str, path: str, timestamp: Optional[int] = None) -> str:
+    """Build an X-Profile-Signature header value for a request."""
+    ts = int(time.time()) if timestamp is None else timestamp
+    digest = hmac.new(secret.encode(), f"{ts}:{method.upper()}:{path}".encode(), hashlib.sha256).hexdigest()
+    return f"{ts}:{digest}"
+
+
+def verify_profile_signature(value: str, method: str, path: str) -> bool:
+    if not settings.profiling_secret or not value:
+        return False
+
+    ts, _, signature = value.partition(":")
+    try:
+        ts_int = int(ts)
+    except ValueError:
+        return False
+
+    if abs(time.time() - ts_int) > SIGNATURE_MAX_AGE:
+        return False
+
+    expected = sign_profile_request(settings.profiling_secret, method, path, ts_int)
+    return hmac.compare_digest(expected, value)
+
+
+def should_profile(request: Request) -> bool:
+    signature = request.headers.get(PROFILE_HEADER)
+    if signature is not None:
+        return verify_profile_signature(signature, request.method, request.url.path)
+
+    every = settings.profiling_sample_every
+    return every > 0 and next(_request_counter) % every == 0
+
+
+def _profile_path(request: Request) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", request.url.path).strip("_") or "root"
+    name = f"{int(time.time() * 1000)}-{request.method.lower()}-{slug}.prof"
+    return os.path.join(settings.profiling_dir, name)
+
+
+def _prune_profiles():
+    """Keep only the newest ``profiling_max_files`` profiles."""
+    names = sorted(name for name in os.listdir(settings.profiling_dir) if name.endswith(".prof"))
+    for name in names[:max(0, len(names) - settings.profiling_max_files)]:
+        try:
+            os.remove(os.path.join(settings.profiling_dir, name))
+        except FileNotFoundError:
+            pass
+
+
+async def profile_requests(request: Request, call_next):
+    """Run cProfile around a signed or sampled request and dump the stats to disk.
+
+    Only registered when ``profiling_enabled`` is set, so requests pay nothing
+    otherwise. cProfile is per-thread: concurrent requests served by the same
+    event loop show up in the same profile, and a request arriving while
+    another is being profiled is served unprofiled.
+    """
+    global _profiling_active
+    if _profiling_active or not should_profile(request):
+        return await call_next(request)
+
+    _profiling_active = True
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        response = await call_next(request)
+    finally:
+        profiler.disable()
+        _profiling_active = False
+
+    path = _profile_path(request)
+    os.makedirs(settings.profiling_dir, exist_ok=True)
+    profiler.dump_stats(path)
+    _prune_profiles()
+    response.headers["X-Profile-Id"] = os.path.basename(path)
+    return response
+
+
+def start_tracemalloc():
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(settings.tracemalloc_frames)
+
+
+def _subsystem_for(traceback: tracemalloc.Traceback) -> str:
+    # Walk from the most recent frame outwards so allocations made inside
+    # libraries are attributed to the app code that triggered them.
+    for frame in reversed(traceback):
+        filename = frame.filename.replace(os.sep, "/")
+        for suffix, subsystem in SUBSYSTEMS.items():
+            if filename.endswith(suffix):
+                return subsystem
+    return "other"
+
+
+def memory_report(limit: int = 20) -> Dict[str, Any]:
+    """Summarize the current tracemalloc snapshot grouped by subsystem."""
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    stats = snapshot.statistics("traceback")
+
+    groups: Dict[str, Dict[str, Any]] = {}
+    for stat in stats:
+        subsystem = _subsystem_for(stat.traceback)
+        group = groups.setdefault(subsystem, {"size_bytes": 0, "count": 0, "top": []})
+        group["size_bytes"] += stat.size
+        group["count"] += stat.count
+        if len(group["top"]) < limit:
+            frame = stat.traceback[-1]
+            group["top"].append({
+                "location": f"{frame.filename}:{frame.lineno}",
+                "size_bytes": stat.size,
+                "count": stat.count,
+            })
+
+    current, peak = tracemalloc.get_traced_memory()
+    top: List[Dict[str, Any]] = []
+    for stat in stats[:limit]:
+        frame = stat.traceback[-1]
+        top.append({
+            "location": f"{frame.filename}:{frame.lineno}",
+            "subsystem": _subsystem_for(stat.traceback),
+            "size_bytes": stat.size,
+            "count": stat.count,
+        })
+
+    return {
+        "traced_current_bytes": current,
+        "traced_peak_bytes": peak,
+        "subsystems": groups,
+        "top": top,
+    }
@@ -0,0 +1,67 @@
+import asyncio
+import re
+from typing import Any, Awaitable, Callable, Dict, List
+
+from app.services import cluster, engines
+from app.services.audio_cache import synthesis_key
+
+# Split after sentence punctuation followed by whitespace (so "3.5" stays
+# intact), after CJK full-width punctuation, and on line breaks.
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|(?<=[。！？])|\n+")
+
+# Output format -> format requested upstream for each sentence. mp3 and
+# ADTS aac are sequences of self-contained frames, so concatenated segments
+# form one stream; wav is rebuilt from raw pcm. Ogg opus and flac carry
+# per-file stream headers (concatenated Ogg is a chained stream many players
+# stop after the first link of), so they are not offered for scripts.
+SPLICE_FORMATS = {
+    "mp3": "mp3",
+    "aac": "aac",
+    "pcm": "pcm",
+    "wav": "pcm",
+}
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in SENTENCE_BOUNDARY.split(text) if s and s.strip()]
+
+
+async def synthesize_script(
+    text: str,
+    params: Dict[str, Any],
+    create: Callable[[Dict[str, Any]], Awaitable[bytes]],
+    max_concurrency: int = 4,
+) -> Dict[str, Any]:
+    """Synthesize ``text`` sentence by sentence through the (cluster) audio cache.
+
+    ``params`` are the upstream kwargs without ``input``; ``create`` sends one
+    sentence upstream. Sentences already in the cache are spliced in as-is,
+    so editing one sentence of a script only re-synthesizes that sentence.
+    """
+    output_format = params["response_format"]
+    upstream_params = {**params, "response_format": SPLICE_FORMATS[output_format]}
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def segment(sentence: str):
+        sentence_params = {**upstream_params, "input": sentence}
+
+        async def synthesize() -> bytes:
+            async with semaphore:
+                return await create(sentence_params)
+
+        # Admitted unconditionally: a new sentence has no frequency history and
+        # would lose every TinyLFU comparison, yet it is what the next edit reuses
+        return await cluster.get_or_create(synthesis_key(sentence_params), synthesize, sentence_params, force=True)
+
+    sentences = split_sentences(text)
+    segments = await asyncio.gather(*[segment(s) for s in sentences])
+
+    audio = b"".join(content for content, _ in segments)
+    if output_format == "wav":
+        audio = engines.pcm_to_wav(audio)
+
+    return {
+        "audio": audio,
+        "sentences": len(sentences),
+        "reused": sum(1 for _, status in segments if not status.endswith("miss")),
+    }
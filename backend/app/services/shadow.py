@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import random
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Set
+
+from openai import OpenAI
+from prometheus_client import Counter
+
+from app.config import settings
+from app.services import upstream
+
+logger = logging.getLogger(__name__)
+
+shadow_requests = Counter(
+    "tts_shadow_requests_total",
+    "Shadow requests by result",
+    ["tool", "result"]
+)
+
+# Shadow calls run on their own threads so they never take a slot from the
+# threadpool that serves primary upstream calls.
+_executor: Optional[ThreadPoolExecutor] = None
+_tasks: Set[asyncio.Task] = set()
+_in_flight = 0
+_disabled = False
+
+
+def validate():
+    """Check the shadow provider once at startup, disabling shadowing if it is invalid."""
+    global _disabled
+    _disabled = False
+    try:
+        target()
+    except ValueError as e:
+        _disabled = True
+        logger.error("Shadow traffic disabled: %s", e)
+
+
+def target() -> Optional[Dict[str, str]]:
+    """Return the shadow provider/model, or None when shadowing is off."""
+    if settings.shadow_sample_rate <= 0 or _disabled:
+        return None
+
+    provider = settings.shadow_provider or upstream.primary_provider()
+    api_key, _ = upstream.provider_credentials(provider)
+    if not api_key:
+        return None
+    return {"provider": provider, "model": settings.shadow_model}
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.shadow_max_concurrency, thread_name_prefix="tts-shadow")
+    return _executor
+
+
+def _call(provider: str, params: Dict[str, Any]):
+    api_key, base_url = upstream.provider_credentials(provider)
+    client = OpenAI(api_key=api_key, base_url=base_url, http_client=upstream.http_client(provider))
+    upstream.call_speech(client, provider, "shadow", **params)
+
+
+async def _run(provider: str, params: Dict[str, Any]):
+    global _in_flight
+    try:
+        await asyncio.get_running_loop().run_in_executor(_get_executor(), _call, provider, params)
+        shadow_requests.labels(tool=settings.tool_name, result="ok").inc()
+    except Exception as e:
+        shadow_requests.labels(tool=settings.tool_name, result="error").inc()
+        logger.info("Shadow request to %s failed: %s", provider, e)
+    finally:
+        _in_flight -= 1
+
+
+def maybe_mirror(params: Dict[str, Any]) -> bool:
+    """Mirror a sample of primary synthesis requests to the shadow target.
+
+    Fire-and-forget: the caller never waits on the shadow call and quota is
+    not touched. When ``shadow_max_concurrency`` calls are already running
+    the request is dropped rather than queued. Never raises: a broken shadow
+    must not affect the primary response.
+    """
+    global _in_flight
+    if random.random() >= settings.shadow_sample_rate:
+        return False
+
+    try:
+        shadow = target()
+        if shadow is None:
+            return False
+
+        if _in_flight >= settings.shadow_max_concurrency:
+            shadow_requests.labels(tool=settings.tool_name, result="dropped").inc()
+            return False
+
+        shadow_params = dict(params)
+        if shadow["model"]:
+            shadow_params["model"] = shadow["model"]
+
+        task = asyncio.create_task(_run(shadow["provider"], shadow_params))
+        _in_flight += 1
+        _tasks.add(task)
+        task.add_done_callback(_tasks.discard)
+        return True
+    except Exception:
+        shadow_requests.labels(tool=settings.tool_name, result="error").inc()
+        logger.exception("Failed to mirror request to shadow")
+        return False
+
+
+async def drain():
+    """Wait for in-flight shadow calls (tests and benchmarks)."""
+    if _tasks:
+        await asyncio.gather(*_tasks, return_exceptions=True)
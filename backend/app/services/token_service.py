@@ -1,11 +1,90 @@
+import hashlib
+import itertools
+import json
+from collections import OrderedDict
 from datetime import date
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 
 from app.config import settings
 
 # In-memory storage (replace with DB in production)
 _device_tokens: Dict[str, Dict[str, Any]] = {}
 
+# Pre-serialized status snapshots: device_id -> (day, version, body, etag).
+# Every mutation stamps the device with a new version from a global counter,
+# so a snapshot is valid only while day and version still match.
+_status_snapshots: "OrderedDict[str, Tuple[str, Optional[int], bytes, str]]" = OrderedDict()
+_versions = itertools.count(1)
+
+def _touch(data: Dict[str, Any]):
+    data["version"] = next(_versions)
+
+def peek_status(device_id: str) -> Dict[str, Any]:
+    """Status for a device without creating or resetting its record."""
+    free_limit = settings.free_generations_per_day
+    data = _device_tokens.get(device_id)
+    if data is None:
+        return {
+            "device_id": device_id,
+            "tokens_remaining": free_limit,
+            "is_premium": False,
+            "daily_free_used": 0,
+            "daily_free_limit": free_limit
+        }
+    
+    daily_used = data["daily_used"].get(str(date.today()), 0)
+    tokens_remaining = data["purchased_tokens"]
+    if tokens_remaining == 0:
+        tokens_remaining = max(0, free_limit - daily_used)
+    
+    return {
+        "device_id": device_id,
+        "tokens_remaining": tokens_remaining,
+        "is_premium": data["is_premium"],
+        "daily_free_used": daily_used,
+        "daily_free_limit": free_limit
+    }
+
+def _cached_snapshot(device_id: str, today: str) -> Tuple[Optional[int], Optional[Tuple[str, Optional[int], bytes, str]]]:
+    """Return the device's current version and its snapshot if still valid."""
+    data = _device_tokens.get(device_id)
+    version = data.get("version") if data is not None else None
+    cached = _status_snapshots.get(device_id)
+    if cached is not None and cached[0] == today and cached[1] == version:
+        return version, cached
+    return version, None
+
+def _serialize(device_id: str) -> bytes:
+    return json.dumps(peek_status(device_id), separators=(",", ":"), ensure_ascii=False).encode()
+
+def status_snapshot(device_id: str) -> Tuple[bytes, str]:
+    """Return the serialized status and its ETag, reusing the cached copy when unchanged."""
+    today = str(date.today())
+    version, cached = _cached_snapshot(device_id, today)
+    if cached is not None:
+        return cached[2], cached[3]
+    
+    body = _serialize(device_id)
+    etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+    _status_snapshots[device_id] = (today, version, body, etag)
+    _status_snapshots.move_to_end(device_id)
+    while len(_status_snapshots) > settings.status_cache_max_entries:
+        _status_snapshots.popitem(last=False)
+    return body, etag
+
+def bulk_status(device_ids: List[str]) -> bytes:
+    """Serialized JSON array of statuses for many devices.
+    
+    Reuses valid snapshots but does not add to the cache, so a large admin
+    query cannot evict the snapshots polling clients rely on.
+    """
+    today = str(date.today())
+    bodies = []
+    for device_id in device_ids:
+        _, cached = _cached_snapshot(device_id, today)
+        bodies.append(cached[2] if cached is not None else _serialize(device_id))
+    return b"[" + b",".join(bodies) + b"]"
+
 class TokenService:
     def __init__(self):
         self.free_limit = settings.free_generations_per_day
@@ -19,12 +98,14 @@ class TokenService:
                 "daily_used": {},
                 "is_premium": False
             }
+            _touch(_device_tokens[device_id])
         
         data = _device_tokens[device_id]
         
         # Reset daily counter if new day
         if today not in data["daily_used"]:
             data["daily_used"] = {today: 0}
+            _touch(data)
         
         return data
     
@@ -40,6 +121,9 @@ class TokenService:
         daily_used = data["daily_used"].get(today, 0)
         return daily_used < self.free_limit
     
+    async def is_premium(self, device_id: str) -> bool:
+        return self._get_device_data(device_id)["is_premium"]
+    
     async def use_generation(self, device_id: str) -> bool:
         data = self._get_device_data(device_id)
         today = str(date.today())
@@ -47,12 +131,14 @@ class TokenService:
         # Use purchased tokens first
         if data["purchased_tokens"] > 0:
             data["purchased_tokens"] -= 1
+            _touch(data)
             return True
         
         # Use daily free
         daily_used = data["daily_used"].get(today, 0)
         if daily_used < self.free_limit:
             data["daily_used"][today] = daily_used + 1
+            _touch(data)
             return True
         
         return False
@@ -61,20 +147,8 @@ class TokenService:
         data = self._get_device_data(device_id)
         data["purchased_tokens"] += amount
         data["is_premium"] = True
+        _touch(data)
     
     async def get_status(self, device_id: str) -> Dict[str, Any]:
-        data = self._get_device_data(device_id)
-        today = str(date.today())
-        daily_used = data["daily_used"].get(today, 0)
-        
-        tokens_remaining = data["purchased_tokens"]
-        if tokens_remaining == 0:
-            tokens_remaining = max(0, self.free_limit - daily_used)
-        
-        return {
-            "device_id": device_id,
-            "tokens_remaining": tokens_remaining,
-            "is_premium": data["is_premium"],
-            "daily_free_used": daily_used,
-            "daily_free_limit": self.free_limit
-        }
+        self._get_device_data(device_id)
+        return peek_status(device_id)
@@ -0,0 +1,89 @@
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from prometheus_client import Histogram
+
+from app.config import settings
+
+tts_stage_duration = Histogram(
+    "tts_stage_duration_seconds",
+    "TTS generation time by stage",
+    ["tool", "stage"]
+)
+
+_export_lock = threading.Lock()
+
+
+class Trace:
+    """Per-request span recorder.
+
+    Every span is observed into ``tts_stage_duration`` as it closes, and the
+    same durations feed the Server-Timing header and the exported trace line,
+    so the three views always agree.
+    """
+
+    def __init__(self, name: str, sampled: bool, **attributes: Any):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex
+        self.sampled = sampled
+        self.attributes = attributes
+        self.spans: List[Dict[str, Any]] = []
+        self._start = time.perf_counter()
+        self._wall_start = time.time()
+        self._finished = False
+
+    def record(self, stage: str, duration: float, offset: Optional[float] = None):
+        if offset is None:
+            offset = time.perf_counter() - self._start - duration
+        self.spans.append({"name": stage, "start_ms": offset * 1000, "duration_ms": duration * 1000})
+        tts_stage_duration.labels(tool=settings.tool_name, stage=stage).observe(duration)
+
+    @contextmanager
+    def span(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, start - self._start)
+
+    def server_timing(self) -> str:
+        parts = [f"{s['name']};dur={s['duration_ms']:.1f}" for s in self.spans]
+        parts.append(f"total;dur={(time.perf_counter() - self._start) * 1000:.1f}")
+        return ", ".join(parts)
+
+    def finish(self, **attributes: Any):
+        if self._finished:
+            return
+        self._finished = True
+        self.attributes.update(attributes)
+        if self.sampled:
+            export({
+                "trace_id": self.trace_id,
+                "name": self.name,
+                "timestamp": self._wall_start,
+                "duration_ms": (time.perf_counter() - self._start) * 1000,
+                "attributes": self.attributes,
+                "spans": self.spans,
+            })
+
+
+def start_trace(name: str, **attributes: Any) -> Trace:
+    sampled = bool(settings.trace_export) and random.random() < settings.trace_sample_rate
+    return Trace(name, sampled, **attributes)
+
+
+def export(record: Dict[str, Any]):
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    with _export_lock:
+        if settings.trace_export == "stdout":
+            sys.stdout.write(line + "\n")
+            sys.stdout.flush()
+        else:
+            with open(settings.trace_export, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
@@ -0,0 +1,92 @@
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from openai import DefaultHttpxClient
+from prometheus_client import Counter, Histogram
+
+from app.config import settings
+
+upstream_ttfb = Histogram(
+    "tts_upstream_ttfb_seconds",
+    "Time to first response byte from the TTS upstream",
+    ["tool", "provider", "model", "role"]
+)
+upstream_duration = Histogram(
+    "tts_upstream_duration_seconds",
+    "Total TTS upstream call time",
+    ["tool", "provider", "model", "role"]
+)
+upstream_bytes = Histogram(
+    "tts_upstream_response_bytes",
+    "Audio bytes returned by the TTS upstream",
+    ["tool", "provider", "model", "role"],
+    buckets=(1e3, 4e3, 16e3, 64e3, 256e3, 1e6, 4e6, 16e6)
+)
+upstream_requests = Counter(
+    "tts_upstream_requests_total",
+    "TTS upstream calls by outcome",
+    ["tool", "provider", "model", "role", "outcome"]
+)
+
+_local = threading.local()
+_http_clients: Dict[str, DefaultHttpxClient] = {}
+_http_clients_lock = threading.Lock()
+
+
+def _mark_first_byte(response):
+    # Response hooks run once headers arrive, before the body is read,
+    # in the thread that made the call.
+    _local.first_byte = time.perf_counter()
+
+
+def http_client(provider: str) -> DefaultHttpxClient:
+    """Shared HTTP client for a provider's OpenAI clients.
+
+    One per provider so connections are kept alive across calls; its
+    response hook lets call_speech measure TTFB. Closed by close().
+    """
+    with _http_clients_lock:
+        if provider not in _http_clients:
+            _http_clients[provider] = DefaultHttpxClient(event_hooks={"response": [_mark_first_byte]})
+        return _http_clients[provider]
+
+
+def close():
+    with _http_clients_lock:
+        for client in _http_clients.values():
+            client.close()
+        _http_clients.clear()
+
+
+def provider_credentials(provider: str) -> Tuple[str, str]:
+    """Return (api_key, base_url) for "proxy" or "openai"."""
+    if provider == "proxy":
+        return settings.llm_proxy_key, settings.llm_proxy_url
+    if provider == "openai":
+        return settings.openai_api_key, settings.openai_base_url
+    raise ValueError(f"Unknown TTS provider: {provider}")
+
+
+def primary_provider() -> str:
+    return "proxy" if settings.llm_proxy_key else "openai"
+
+
+def call_speech(client, provider: str, role: str, **params: Any):
+    """Call the speech endpoint and record latency, size and outcome."""
+    labels = {"tool": settings.tool_name, "provider": provider, "model": params.get("model", ""), "role": role}
+    _local.first_byte = None
+    start = time.perf_counter()
+    try:
+        response = client.audio.speech.create(**params)
+    except Exception:
+        upstream_requests.labels(**labels, outcome="error").inc()
+        raise
+
+    first_byte: Optional[float] = _local.first_byte
+    if first_byte is not None:
+        upstream_ttfb.labels(**labels).observe(first_byte - start)
+    upstream_duration.labels(**labels).observe(time.perf_counter() - start)
+    upstream_bytes.labels(**labels).observe(len(response.content))
+    upstream_requests.labels(**labels, outcome="ok").inc()
+    return response
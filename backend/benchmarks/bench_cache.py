@@ -0,0 +1,64 @@
+"""Audio cache hit ratio: TinyLFU admission vs plain LRU on a replayed trace.
+
+The trace is either a file with one synthesis key (or text) per line, or a
+synthetic mix of Zipf-distributed popular phrases and single-use texts.
+Every entry is counted as one unit, so capacity is in entries.
+
+Usage (from backend/):
+    python -m benchmarks.bench_cache [--trace keys.txt] [--requests 200000]
+"""
+import argparse
+import random
+import time
+
+from app.services.audio_cache import AudioCache, FrequencySketch
+
+
+def synthetic_trace(requests: int, phrases: int, one_off_ratio: float, seed: int):
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(phrases)]
+    popular = rng.choices(range(phrases), weights=weights, k=requests)
+    return [
+        f"one-off-{n}" if rng.random() < one_off_ratio else f"phrase-{popular[n]}"
+        for n in range(requests)
+    ]
+
+
+def replay(policy: str, capacity: int, trace):
+    cache = AudioCache(max_bytes=capacity, policy=policy, sketch=FrequencySketch(width=capacity * 4))
+    start = time.perf_counter()
+    for key in trace:
+        if cache.get(key) is None:
+            cache.put(key, b"x")
+    return cache.stats()["hit_ratio"], time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trace", help="file with one key per line")
+    parser.add_argument("--requests", type=int, default=200000)
+    parser.add_argument("--phrases", type=int, default=5000)
+    parser.add_argument("--one-off-ratio", type=float, default=0.6)
+    parser.add_argument("--capacities", default="100,500,1000,2500")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.trace:
+        with open(args.trace, encoding="utf-8") as f:
+            trace = [line.rstrip("\n") for line in f if line.strip()]
+    else:
+        trace = synthetic_trace(args.requests, args.phrases, args.one_off_ratio, args.seed)
+
+    print(f"trace: {len(trace)} requests, {len(set(trace))} distinct keys")
+    print(f"{'capacity':>9}{'lru':>9}{'tinylfu':>9}{'gain':>8}{'lru s':>8}{'tlfu s':>8}")
+    for capacity in [int(c) for c in args.capacities.split(",")]:
+        lru, lru_time = replay("lru", capacity, trace)
+        tinylfu, tinylfu_time = replay("tinylfu", capacity, trace)
+        print(
+            f"{capacity:>9}{lru:>9.3f}{tinylfu:>9.3f}{tinylfu - lru:>+8.3f}"
+            f"{lru_time:>8.2f}{tinylfu_time:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Bytes on the wire per second of audio for each output format and quality.
+
+Synthesizes the same text once per format and quality against the
+configured upstream and reports payload size relative to audio duration.
+Duration is taken from each quality's pcm rendition (24kHz 16-bit mono).
+
+Usage (from backend/):
+    python -m benchmarks.bench_formats [--voice emily]
+"""
+import argparse
+import sys
+import time
+
+from openai import OpenAI
+
+from app.api.v1.tts import AUDIO_FORMATS, QUALITY_MODELS, VOICES
+from app.config import settings
+
+PCM_BYTES_PER_SECOND = 24000 * 2
+
+SAMPLE_TEXT = (
+    "Welcome to the course. In this lesson we will cover the basics of "
+    "project planning, from defining goals to tracking progress, and we will "
+    "look at a few common mistakes that slow teams down."
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--voice", default="emily", choices=list(VOICES))
+    parser.add_argument("--text", default=SAMPLE_TEXT)
+    args = parser.parse_args()
+
+    api_key = settings.llm_proxy_key or settings.openai_api_key
+    base_url = settings.llm_proxy_url if settings.llm_proxy_key else settings.openai_base_url
+    if not api_key:
+        sys.exit("TTS service not configured (set LLM_PROXY_KEY or OPENAI_API_KEY)")
+
+    client = OpenAI(api_key=api_key, base_url=base_url)
+
+    results = {}
+    for quality, model in QUALITY_MODELS.items():
+        for fmt in AUDIO_FORMATS:
+            start = time.perf_counter()
+            response = client.audio.speech.create(
+                model=model,
+                voice=VOICES[args.voice]["openai_voice"],
+                input=args.text,
+                response_format=fmt,
+            )
+            results[quality, fmt] = (len(response.content), time.perf_counter() - start)
+
+    # Each model renders the text at its own length, so rates use that quality's pcm
+    pcm_sizes = {quality: results[quality, "pcm"][0] for quality in QUALITY_MODELS}
+    for quality, pcm_size in pcm_sizes.items():
+        print(f"audio duration ({quality}): {pcm_size / PCM_BYTES_PER_SECOND:.2f}s")
+    print(f"{'format':<8}{'quality':<10}{'bytes':>10}{'bytes/s':>10}{'kbit/s':>9}{'vs pcm':>8}{'latency':>9}")
+    for (quality, fmt), (size, elapsed) in sorted(results.items(), key=lambda r: (r[1][0], r[0])):
+        per_second = size / (pcm_sizes[quality] / PCM_BYTES_PER_SECOND)
+        print(
+            f"{fmt:<8}{quality:<10}{size:>10}{per_second:>10.0f}{per_second * 8 / 1000:>9.1f}"
+            f"{size / pcm_sizes[quality]:>8.2f}{elapsed:>8.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Latency of /generate paths: upstream miss, cache hit and Idempotency-Key replay.
+
+Requests go through the full ASGI app in-process with a stub upstream
+that sleeps for --upstream-ms, so the numbers show the server-side cost
+of each path without network noise.
+
+Usage (from backend/):
+    python -m benchmarks.bench_idempotency [--requests 500] [--upstream-ms 300]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from unittest.mock import patch
+
+import httpx
+
+from app.main import app
+from app.services.audio_cache import audio_cache
+from app.services.idempotency import idempotency_store
+from app.services.token_service import _device_tokens
+
+
+class StubResponse:
+    def __init__(self, content: bytes):
+        self.content = content
+
+
+class StubClient:
+    def __init__(self, latency: float, size: int):
+        self.latency = latency
+        self.size = size
+        self.calls = 0
+        self.audio = self
+        self.speech = self
+
+    def create(self, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        return StubResponse(b"\0" * self.size)
+
+
+async def timed(client, device_id, text, key=None):
+    headers = {"X-Device-Id": device_id}
+    if key:
+        headers["Idempotency-Key"] = key
+    start = time.perf_counter()
+    response = await client.post("/api/v1/tts/generate", json={"text": text, "voice": "emily"}, headers=headers)
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200, response.text
+    return elapsed
+
+
+def report(name, samples):
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"{name:<22}{len(samples):>6}{statistics.median(samples) * 1000:>10.2f}{p99 * 1000:>10.2f}")
+
+
+async def run(args):
+    stub = StubClient(args.upstream_ms / 1000, args.audio_bytes)
+    transport = httpx.ASGITransport(app=app)
+    misses, hits, replays = [], [], []
+
+    with patch("app.api.v1.tts.get_tts_client", return_value=stub):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for n in range(args.requests):
+                _device_tokens.clear()
+                text = f"Benchmark sentence number {n}."
+                if n < args.misses:
+                    misses.append(await timed(client, "bench-device", text, key=f"key-{n}"))
+                    continue
+                replays.append(await timed(client, "bench-device", f"Benchmark sentence number {n % args.misses}.", key=f"key-{n % args.misses}"))
+                hits.append(await timed(client, "bench-device", f"Benchmark sentence number {n % args.misses}."))
+
+    print(f"upstream calls: {stub.calls} for {args.requests * 2 - args.misses} requests")
+    print(f"{'path':<22}{'n':>6}{'p50 ms':>10}{'p99 ms':>10}")
+    report("upstream miss", misses)
+    report("cache hit", hits)
+    report("idempotent replay", replays)
+    audio_cache.clear()
+    idempotency_store.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--misses", type=int, default=20)
+    parser.add_argument("--upstream-ms", type=float, default=300)
+    parser.add_argument("--audio-bytes", type=int, default=64000)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
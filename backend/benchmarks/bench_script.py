@@ -0,0 +1,83 @@
+"""Upstream cost of iterating on a script: sentence cache vs full re-synthesis.
+
+Builds a ~5000 character script and applies a series of single-sentence
+edits. Each version goes through the script synthesis path with a stub
+upstream that counts the characters and calls it receives, which is what
+the paid API bills for.
+
+Usage (from backend/):
+    python -m benchmarks.bench_script [--edits 20] [--latency-ms 0]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from app.services.audio_cache import audio_cache
+from app.services.script_synthesis import split_sentences, synthesize_script
+
+WORDS = (
+    "project team plan goal review budget timeline risk customer feature "
+    "release design test feedback meeting report quality scope"
+).split()
+
+
+def build_script(rng: random.Random, target_chars: int) -> str:
+    sentences = []
+    length = 0
+    while length < target_chars - 80:
+        sentence = " ".join(rng.choices(WORDS, k=rng.randint(6, 14))).capitalize() + "."
+        sentences.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(sentences)
+
+
+def edit_script(rng: random.Random, script: str) -> str:
+    sentences = split_sentences(script)
+    index = rng.randrange(len(sentences))
+    sentences[index] = " ".join(rng.choices(WORDS, k=rng.randint(6, 14))).capitalize() + "."
+    return " ".join(sentences)
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    usage = {"calls": 0, "chars": 0}
+
+    async def create(params):
+        usage["calls"] += 1
+        usage["chars"] += len(params["input"])
+        if args.latency_ms:
+            await asyncio.sleep(args.latency_ms / 1000)
+        return params["input"].encode()
+
+    params = {"model": "tts-1", "voice": "nova", "speed": 1.0, "response_format": "mp3"}
+    script = build_script(rng, args.chars)
+    audio_cache.clear()
+
+    print(f"script: {len(script)} chars, {len(split_sentences(script))} sentences")
+    print(f"{'version':>8}{'calls':>7}{'chars':>8}{'full':>7}{'reused':>8}{'time':>8}")
+    for version in range(args.edits + 1):
+        if version:
+            script = edit_script(rng, script)
+        usage.update(calls=0, chars=0)
+        start = time.perf_counter()
+        result = await synthesize_script(script, params, create, args.concurrency)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{version:>8}{usage['calls']:>7}{usage['chars']:>8}{len(script):>7}"
+            f"{result['reused']:>5}/{result['sentences']:<3}{elapsed * 1000:>6.1f}ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chars", type=int, default=5000)
+    parser.add_argument("--edits", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
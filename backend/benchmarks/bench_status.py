@@ -0,0 +1,97 @@
+"""Cost of /tokens/status polls and the admin bulk status query.
+
+Compares the previous path (TokenService + TokenStatus validation) with
+the cached snapshot, and a cached snapshot answered with 304, all through
+the full ASGI app in-process.
+
+Usage (from backend/):
+    python -m benchmarks.bench_status [--requests 2000] [--devices 5000]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from unittest.mock import patch
+
+import httpx
+
+from app.api.v1.tokens import TokenStatus
+from app.config import settings
+from app.main import app
+from app.services import token_service
+from app.services.token_service import TokenService, _device_tokens
+
+
+async def legacy_status(device_id: str) -> TokenStatus:
+    return TokenStatus(**await TokenService().get_status(device_id))
+
+
+def report(name, samples):
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"{name:<22}{len(samples):>6}{statistics.median(samples) * 1e6:>10.1f}{p99 * 1e6:>10.1f}")
+
+
+async def run(args):
+    service = TokenService()
+    for n in range(args.devices):
+        await service.use_generation(f"bench-device-{n}")
+
+    transport = httpx.ASGITransport(app=app)
+    headers = {"X-Device-Id": "bench-device-0"}
+    legacy, fresh, cached = [], [], []
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            await legacy_status("bench-device-0")
+            legacy.append(time.perf_counter() - start)
+
+            await service.add_tokens("bench-device-1", 0)
+            start = time.perf_counter()
+            token_service.status_snapshot("bench-device-1")
+            fresh.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            token_service.status_snapshot("bench-device-0")
+            cached.append(time.perf_counter() - start)
+
+        etag = (await client.get("/api/v1/tokens/status", headers=headers)).headers["ETag"]
+        http_200, http_304 = [], []
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            await client.get("/api/v1/tokens/status", headers=headers)
+            http_200.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            response = await client.get("/api/v1/tokens/status", headers={**headers, "If-None-Match": etag})
+            http_304.append(time.perf_counter() - start)
+            assert response.status_code == 304
+
+        device_ids = [f"bench-device-{n}" for n in range(args.devices)]
+        with patch.object(settings, "admin_api_key", "bench"):
+            start = time.perf_counter()
+            response = await client.post(
+                "/api/v1/admin/tokens/status", json={"device_ids": device_ids}, headers={"X-Admin-Key": "bench"}
+            )
+            bulk = time.perf_counter() - start
+            assert response.status_code == 200, response.text
+
+    print(f"{'path':<22}{'n':>6}{'p50 us':>10}{'p99 us':>10}")
+    report("service + pydantic", legacy)
+    report("snapshot rebuild", fresh)
+    report("snapshot cached", cached)
+    report("GET 200", http_200)
+    report("GET 304", http_304)
+    print(f"bulk status for {args.devices} devices: {bulk * 1000:.1f} ms, {len(response.content)} bytes")
+    _device_tokens.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--devices", type=int, default=5000)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+import asyncio
+import json
+import random
+import pytest
+from unittest.mock import patch, MagicMock
+from fastapi.testclient import TestClient
+from app.main import app
+from app.api.v1 import tts
+from app.services.audio_cache import AudioCache, FrequencySketch, audio_cache, synthesis_key
+from app.services.token_service import _device_tokens
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+@pytest.fixture(autouse=True)
+def clear_state():
+    """Clear token storage and audio cache before each test."""
+    _device_tokens.clear()
+    audio_cache.clear()
+    yield
+    _device_tokens.clear()
+    audio_cache.clear()
+
+@pytest.fixture
+def mock_upstream():
+    mock_response = MagicMock()
+    mock_response.content = b"fake audio content"
+    mock_client = MagicMock()
+    mock_client.audio.speech.create.return_value = mock_response
+
+    with patch("app.api.v1.tts.OpenAI", return_value=mock_client), \
+         patch("app.api.v1.tts.settings") as mock_settings:
+        mock_settings.llm_proxy_key = "test-key"
+        mock_settings.llm_proxy_url = "https://test.api"
+        mock_settings.tool_name = "murf-tts"
+        yield mock_client
+
+def _params(text, voice="nova"):
+    return {"model": "tts-1", "voice": voice, "input": text, "speed": 1.0, "response_format": "mp3"}
+
+def _replay(cache, trace):
+    for key in trace:
+        if cache.get(key) is None:
+            cache.put(key, b"x")
+    return cache.stats()["hit_ratio"]
+
+def test_synthesis_key_canonical():
+    """Test equivalent parameters share a key and different ones don't."""
+    assert synthesis_key(_params("Hello")) == synthesis_key(_params(" Hello\n"))
+    assert synthesis_key(_params("Hello")) == synthesis_key({**_params("Hello"), "speed": 1})
+    assert synthesis_key(_params("Hello")) != synthesis_key(_params("Hello", voice="onyx"))
+
+def test_sketch_estimates_and_ages():
+    """Test the sketch counts accesses and halves counts when aging."""
+    sketch = FrequencySketch(width=64, sample_size=1000)
+    for _ in range(6):
+        sketch.increment("popular")
+    sketch.increment("rare")
+
+    assert sketch.estimate("popular") == 6
+    assert sketch.estimate("rare") == 1
+    assert sketch.estimate("unseen") == 0
+
+    sketch._age()
+    assert sketch.estimate("popular") == 3
+    assert sketch.estimate("rare") == 0
+
+def test_sketch_saturates():
+    """Test counters stop at the 4-bit maximum."""
+    sketch = FrequencySketch(width=64)
+    for _ in range(100):
+        sketch.increment("key")
+    assert sketch.estimate("key") == FrequencySketch.MAX_COUNT
+
+def test_tinylfu_rejects_one_off_entries():
+    """Test a single-use entry does not evict a popular one."""
+    cache = AudioCache(max_bytes=2, policy="tinylfu")
+    for key in ["a", "b", "a", "b", "a", "b"]:
+        if cache.get(key) is None:
+            cache.put(key, b"x")
+
+    cache.get("one-off")
+    assert cache.put("one-off", b"x") is False
+    assert "a" in cache and "b" in cache
+    assert cache.stats()["rejections"] == 1
+
+def test_forced_put_bypasses_admission():
+    """Test force admits an entry the sketch would reject."""
+    cache = AudioCache(max_bytes=2, policy="tinylfu")
+    for key in ["a", "b", "a", "b"]:
+        cache.get(key)
+        cache.put(key, b"x")
+
+    assert cache.put("segment", b"x", force=True) is True
+    assert "segment" in cache and len(cache) == 2
+
+def test_lru_admits_everything():
+    """Test plain LRU evicts the least recently used entry."""
+    cache = AudioCache(max_bytes=2, policy="lru")
+    cache.put("a", b"x")
+    cache.put("b", b"x")
+    cache.get("a")
+    assert cache.put("c", b"x") is True
+    assert "b" not in cache
+    assert cache.size == 2
+
+def test_tinylfu_beats_lru_on_scan_heavy_trace():
+    """Test TinyLFU hit ratio exceeds LRU when one-offs dominate."""
+    rng = random.Random(42)
+    popular = [f"phrase-{i}" for i in range(20)]
+    trace = []
+    for n in range(5000):
+        if rng.random() < 0.3:
+            trace.append(rng.choice(popular))
+        else:
+            trace.append(f"one-off-{n}")
+
+    lru = _replay(AudioCache(max_bytes=30, policy="lru"), trace)
+    tinylfu = _replay(AudioCache(max_bytes=30, policy="tinylfu"), trace)
+
+    assert tinylfu > lru
+    assert tinylfu > 0.25
+
+def test_hot_phrases_report():
+    """Test hot phrases are ranked by estimated frequency."""
+    cache = AudioCache(max_bytes=100, hot_capacity=2)
+    for text, count in [("often", 5), ("sometimes", 2), ("rarely", 1)]:
+        for _ in range(count):
+            cache.get(synthesis_key(_params(text)), _params(text))
+
+    hot = cache.hot_phrases()
+    assert [h["params"]["input"] for h in hot] == ["often", "sometimes"]
+    assert hot[0]["estimate"] == 5
+
+def test_hot_phrases_round_trip(tmp_path):
+    """Test a saved hot phrase report seeds a fresh cache."""
+    path = str(tmp_path / "hot.json")
+    cache = AudioCache(max_bytes=100)
+    for _ in range(3):
+        cache.get(synthesis_key(_params("Welcome back")), _params("Welcome back"))
+    cache.save_hot_phrases(path, 10)
+
+    fresh = AudioCache(max_bytes=100)
+    params = fresh.load_hot_phrases(path, 10)
+
+    assert params == [_params("Welcome back")]
+    assert fresh.sketch.estimate(synthesis_key(params[0])) == 3
+
+@pytest.mark.asyncio
+async def test_get_or_create_single_flight():
+    """Test concurrent misses share one synthesis."""
+    cache = AudioCache(max_bytes=100)
+    calls = 0
+
+    async def create():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return b"audio"
+
+    results = await asyncio.gather(*[cache.get_or_create("key", create) for _ in range(5)])
+
+    assert calls == 1
+    assert sorted(status for _, status in results) == ["miss"] + ["shared"] * 4
+    assert (await cache.get_or_create("key", create))[1] == "hit"
+
+@pytest.mark.asyncio
+async def test_single_flight_survives_leader_cancellation():
+    """Test cancelling the caller that started a synthesis doesn't fail the callers sharing it."""
+    cache = AudioCache(max_bytes=100)
+    release = asyncio.Event()
+
+    async def create():
+        await release.wait()
+        return b"audio"
+
+    leader = asyncio.create_task(cache.get_or_create("key", create))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(cache.get_or_create("key", create))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    release.set()
+
+    assert await follower == (b"audio", "shared")
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    assert "key" in cache
+
+def test_generate_served_from_cache(client, mock_upstream):
+    """Test a repeated request is served from cache without an upstream call."""
+    for expected in ["MISS", "HIT"]:
+        response = client.post(
+            "/api/v1/tts/generate",
+            json={"text": "Hello world", "voice": "emily"},
+            headers={"X-Device-Id": "cache-device-001"}
+        )
+        assert response.status_code == 200
+        assert response.headers["X-Cache"] == expected
+        assert response.content == b"fake audio content"
+
+    assert mock_upstream.audio.speech.create.call_count == 1
+    # Quota is still charged for cached generations
+    assert _device_tokens["cache-device-001"]["daily_used"] != {}
+
+def test_voices_sharing_upstream_voice_share_cache(client, mock_upstream):
+    """Test app voices mapped to the same upstream voice reuse entries."""
+    for voice in ["emily", "chloe"]:
+        client.post(
+            "/api/v1/tts/generate",
+            json={"text": "Hello world", "voice": voice},
+            headers={"X-Device-Id": "cache-device-002"}
+        )
+
+    assert mock_upstream.audio.speech.create.call_count == 1
+
+@pytest.mark.asyncio
+async def test_warm_audio_cache(tmp_path, mock_upstream):
+    """Test startup warming synthesizes saved hot phrases."""
+    path = tmp_path / "hot.json"
+    path.write_text(json.dumps([
+        {"key": "ignored", "estimate": 4, "params": _params("Good morning")},
+    ]))
+
+    tts.settings.audio_cache_hot_file = str(path)
+    tts.settings.audio_cache_warm_top_k = 10
+    await tts.warm_audio_cache()
+
+    assert synthesis_key(_params("Good morning")) in audio_cache
+    mock_upstream.audio.speech.create.assert_called_once()
+
+def test_cache_admin_endpoints(client):
+    """Test cache stats and hot phrase report are admin guarded."""
+    with patch("app.api.v1.admin.settings") as mock_settings:
+        mock_settings.admin_api_key = "admin-key"
+        assert client.get("/api/v1/admin/cache/hot").status_code == 401
+
+        response = client.get("/api/v1/admin/cache/stats", headers={"X-Admin-Key": "admin-key"})
+        assert response.status_code == 200
+        assert response.json()["policy"] == "tinylfu"
+
+        response = client.get("/api/v1/admin/cache/hot", headers={"X-Admin-Key": "admin-key"})
+        assert response.status_code == 200
+        assert response.json() == []
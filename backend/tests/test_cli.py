@@ -0,0 +1,109 @@
+import json
+import pytest
+from unittest.mock import patch, MagicMock
+from app import cli
+from app.services.audio_cache import audio_cache
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Clear the audio cache before each test."""
+    audio_cache.clear()
+    yield
+    audio_cache.clear()
+
+@pytest.fixture
+def mock_client():
+    def create(**kwargs):
+        response = MagicMock()
+        response.content = f"{kwargs['voice']}:{kwargs['input']}".encode()
+        return response
+
+    client = MagicMock()
+    client.audio.speech.create.side_effect = create
+    with patch("app.api.v1.tts.get_tts_client", return_value=client):
+        yield client
+
+def _write_csv(path, rows):
+    lines = ["id,text,voice,format"] + [",".join(row) for row in rows]
+    path.write_text("\n".join(lines) + "\n")
+
+def test_synth_csv(tmp_path, mock_client):
+    """Test every manifest row is written to its own file."""
+    manifest = tmp_path / "lines.csv"
+    _write_csv(manifest, [("intro", "Welcome", "james", ""), ("outro", "Goodbye", "", "wav")])
+    out = tmp_path / "out"
+
+    assert cli.main(["synth", str(manifest), "--out", str(out)]) == 0
+
+    assert (out / "intro.mp3").read_bytes() == b"onyx:Welcome"
+    assert (out / "outro.wav").read_bytes() == b"nova:Goodbye"
+    assert not list(out.glob("*.tmp"))
+
+def test_synth_jsonl_dedupes_repeated_lines(tmp_path, mock_client):
+    """Test identical lines are synthesized once."""
+    manifest = tmp_path / "lines.jsonl"
+    manifest.write_text("\n".join(json.dumps({"text": "Repeat after me"}) for _ in range(3)))
+
+    assert cli.main(["synth", str(manifest), "--out", str(tmp_path / "out")]) == 0
+
+    assert sorted(p.name for p in (tmp_path / "out").glob("*.mp3")) == ["1.mp3", "2.mp3", "3.mp3"]
+    assert mock_client.audio.speech.create.call_count == 1
+
+def test_synth_resumes(tmp_path, mock_client):
+    """Test a rerun skips items recorded as done."""
+    manifest = tmp_path / "lines.csv"
+    out = tmp_path / "out"
+    _write_csv(manifest, [("a", "First", "emily", "")])
+    cli.main(["synth", str(manifest), "--out", str(out)])
+
+    _write_csv(manifest, [("a", "First", "emily", ""), ("b", "Second", "emily", "")])
+    audio_cache.clear()
+    mock_client.audio.speech.create.reset_mock()
+    cli.main(["synth", str(manifest), "--out", str(out)])
+
+    assert mock_client.audio.speech.create.call_count == 1
+    assert mock_client.audio.speech.create.call_args.kwargs["input"] == "Second"
+    progress = [json.loads(line) for line in (out / cli.PROGRESS_FILE).read_text().splitlines()]
+    assert [entry["id"] for entry in progress] == ["a", "b"]
+
+def test_synth_resumes_changed_rows(tmp_path, mock_client):
+    """Test rows whose text changed or moved are synthesized again on resume."""
+    manifest = tmp_path / "lines.jsonl"
+    out = tmp_path / "out"
+    manifest.write_text("\n".join(json.dumps({"text": t}) for t in ["First", "Second"]))
+    cli.main(["synth", str(manifest), "--out", str(out)])
+
+    # Inserting a row shifts the default ids of the rows after it
+    manifest.write_text("\n".join(json.dumps({"text": t}) for t in ["Intro", "First", "Second"]))
+    mock_client.audio.speech.create.reset_mock()
+    cli.main(["synth", str(manifest), "--out", str(out)])
+
+    assert (out / "1.mp3").read_bytes() == b"nova:Intro"
+    assert (out / "2.mp3").read_bytes() == b"nova:First"
+    assert (out / "3.mp3").read_bytes() == b"nova:Second"
+
+@pytest.mark.parametrize("ids", [("a", "a"), ("a b", "a_b"), ("", "1")])
+def test_synth_rejects_duplicate_ids(tmp_path, mock_client, capsys, ids):
+    """Test ids that collide, raw or as file names, are rejected before synthesis."""
+    manifest = tmp_path / "lines.csv"
+    _write_csv(manifest, [(ids[0], "One", "emily", ""), (ids[1], "Two", "emily", "")])
+
+    assert cli.main(["synth", str(manifest), "--out", str(tmp_path / "out")]) == 2
+
+    assert "Duplicate id" in capsys.readouterr().err
+    mock_client.audio.speech.create.assert_not_called()
+
+def test_synth_reports_failures(tmp_path, mock_client, capsys):
+    """Test invalid rows and upstream errors are reported and not marked done."""
+    manifest = tmp_path / "lines.csv"
+    _write_csv(manifest, [("bad-voice", "Hello", "nobody", ""), ("boom", "Explode", "emily", "")])
+
+    def create(**kwargs):
+        raise RuntimeError("upstream down")
+    mock_client.audio.speech.create.side_effect = create
+
+    assert cli.main(["synth", str(manifest), "--out", str(tmp_path / "out"), "--retries", "0"]) == 1
+
+    err = capsys.readouterr().err
+    assert "bad-voice" in err and "boom" in err
+    assert cli.read_progress(str(tmp_path / "out")) == {}
@@ -0,0 +1,314 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import httpx
+import pytest
+from unittest.mock import patch, AsyncMock
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import cluster, engines
+from app.services.audio_cache import audio_cache, synthesis_key
+from app.services.token_service import _device_tokens
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NODES = ["http://node-a:8000", "http://node-b:8000", "http://node-c:8000"]
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+@pytest.fixture(autouse=True)
+def clear_state():
+    """Clear token storage and audio cache before each test."""
+    _device_tokens.clear()
+    audio_cache.clear()
+    yield
+    _device_tokens.clear()
+    audio_cache.clear()
+
+@pytest.fixture
+def cluster_node():
+    """Configure this process as node-a of a three node cluster."""
+    with patch("app.services.cluster.settings") as mock_settings, \
+         patch("app.api.v1.internal.settings") as internal_settings, \
+         patch("app.services.cluster.ring", cluster.HashRing(NODES)):
+        mock_settings.cluster_self_url = NODES[0]
+        mock_settings.cluster_secret = "cluster-secret"
+        internal_settings.cluster_secret = "cluster-secret"
+        yield
+
+def _params(text):
+    return {"model": "tts-1", "voice": "nova", "input": text, "speed": 1.0, "response_format": "mp3"}
+
+def _key_owned_by(node):
+    ring = cluster.HashRing(NODES)
+    for i in range(1000):
+        params = _params(f"phrase {i}")
+        if ring.owner(synthesis_key(params)) == node:
+            return params
+
+def test_ring_spreads_keys():
+    """Test keys are spread roughly evenly over nodes."""
+    ring = cluster.HashRing(NODES)
+    owners = Counter(ring.owner(f"key-{i}") for i in range(9000))
+
+    assert set(owners) == set(NODES)
+    assert min(owners.values()) > 2000
+
+def test_ring_adding_node_moves_few_keys():
+    """Test adding a node only reassigns keys to the new node."""
+    before = cluster.HashRing(NODES)
+    after = cluster.HashRing(NODES + ["http://node-d:8000"])
+
+    moved = [k for k in (f"key-{i}" for i in range(4000)) if before.owner(k) != after.owner(k)]
+
+    assert all(after.owner(k) == "http://node-d:8000" for k in moved)
+    assert len(moved) < 1600
+
+def test_parse_peers():
+    """Test peer config parsing strips whitespace and trailing slashes."""
+    assert cluster.parse_peers(" http://a:1/, http://b:2 ,") == ["http://a:1", "http://b:2"]
+
+@pytest.mark.asyncio
+async def test_no_cluster_uses_local_cache():
+    """Test keys are served locally when no cluster is configured."""
+    create = AsyncMock(return_value=b"audio")
+    params = _params("hello")
+
+    assert await cluster.get_or_create(synthesis_key(params), create, params) == (b"audio", "miss")
+    assert synthesis_key(params) in audio_cache
+
+@pytest.mark.asyncio
+async def test_non_owner_fetches_from_owner(cluster_node):
+    """Test keys owned by a peer are fetched from it and not synthesized locally."""
+    params = _key_owned_by(NODES[1])
+    create = AsyncMock(return_value=b"local")
+
+    with patch("app.services.cluster.fetch_from_peer", AsyncMock(return_value=(b"remote", "hit"))) as fetch:
+        result = await cluster.get_or_create(synthesis_key(params), create, params)
+
+    assert result == (b"remote", "peer-hit")
+    fetch.assert_awaited_once_with(NODES[1], params, False)
+    create.assert_not_awaited()
+    assert synthesis_key(params) not in audio_cache
+
+@pytest.mark.asyncio
+async def test_unreachable_owner_falls_back_to_local(cluster_node):
+    """Test a failed peer fetch synthesizes locally."""
+    params = _key_owned_by(NODES[2])
+    create = AsyncMock(return_value=b"local")
+
+    with patch("app.services.cluster.fetch_from_peer", AsyncMock(side_effect=httpx.ConnectError("down"))):
+        result = await cluster.get_or_create(synthesis_key(params), create, params)
+
+    assert result == (b"local", "miss")
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("status_code", [401, 502, 503])
+async def test_owner_error_is_not_retried_locally(cluster_node, status_code):
+    """Test an owner's error response is raised, not retried locally."""
+    params = _key_owned_by(NODES[1])
+    create = AsyncMock(return_value=b"local")
+    transport = httpx.MockTransport(lambda request: httpx.Response(
+        status_code, json={"detail": "owner failed"}, headers={"Retry-After": "1"}
+    ))
+
+    with patch("app.services.cluster._client", httpx.AsyncClient(transport=transport)):
+        with pytest.raises(cluster.PeerError) as e:
+            await cluster.get_or_create(synthesis_key(params), create, params)
+
+    assert e.value.status_code == status_code
+    assert e.value.detail == "owner failed"
+    create.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_owner_connect_timeout_falls_back_to_local(cluster_node):
+    """Test an owner that cannot be connected to is bypassed."""
+    params = _key_owned_by(NODES[1])
+    create = AsyncMock(return_value=b"local")
+
+    def timeout(request):
+        raise httpx.ConnectTimeout("unreachable", request=request)
+
+    with patch("app.services.cluster._client", httpx.AsyncClient(transport=httpx.MockTransport(timeout))):
+        result = await cluster.get_or_create(synthesis_key(params), create, params)
+
+    assert result == (b"local", "miss")
+
+@pytest.mark.asyncio
+async def test_owner_read_timeout_is_not_retried_locally(cluster_node):
+    """Test a slow but reachable owner is not raced by a second local synthesis."""
+    params = _key_owned_by(NODES[1])
+    create = AsyncMock(return_value=b"local")
+
+    def timeout(request):
+        raise httpx.ReadTimeout("slow", request=request)
+
+    with patch("app.services.cluster._client", httpx.AsyncClient(transport=httpx.MockTransport(timeout))):
+        with pytest.raises(cluster.PeerError) as e:
+            await cluster.get_or_create(synthesis_key(params), create, params)
+
+    assert e.value.status_code == 502
+    create.assert_not_awaited()
+
+def test_generate_hides_other_owner_errors(client, cluster_node):
+    """Test owner errors other than 503 reach users as a generic 502."""
+    params = _key_owned_by(NODES[1])
+    error = cluster.PeerError(NODES[1], 401, "Invalid cluster secret")
+
+    with patch("app.services.cluster.fetch_from_peer", AsyncMock(side_effect=error)), \
+         patch("app.api.v1.tts.get_tts_client"):
+        response = client.post(
+            "/api/v1/tts/generate",
+            json={"text": params["input"], "voice": "emily"},
+            headers={"X-Device-Id": "cluster-device-002"}
+        )
+
+    assert response.status_code == 502
+    assert "secret" not in response.text
+
+def test_ring_requires_secret():
+    """Test a cluster without a shared secret is not enabled."""
+    with patch("app.services.cluster.settings") as mock_settings:
+        mock_settings.cluster_peers = ",".join(NODES)
+        mock_settings.cluster_self_url = NODES[0]
+        mock_settings.cluster_vnodes = 16
+        mock_settings.cluster_secret = ""
+        assert cluster.build_ring() is None
+
+        mock_settings.cluster_secret = "cluster-secret"
+        assert cluster.build_ring().nodes == sorted(NODES)
+
+def test_generate_passes_owner_busy_through(client, cluster_node):
+    """Test a busy owner surfaces as 503 with Retry-After on the non-owner."""
+    params = _key_owned_by(NODES[1])
+    error = cluster.PeerError(NODES[1], 503, "Synthesis engine busy, please retry", "1")
+
+    with patch("app.services.cluster.fetch_from_peer", AsyncMock(side_effect=error)), \
+         patch("app.api.v1.tts.get_tts_client"):
+        response = client.post(
+            "/api/v1/tts/generate",
+            json={"text": params["input"], "voice": "emily"},
+            headers={"X-Device-Id": "cluster-device-001"}
+        )
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+def test_internal_fetch_engine_busy(client, cluster_node):
+    """Test a busy engine on the owner answers 503, not 502."""
+    engine = AsyncMock()
+    engine.synthesize.side_effect = engines.EngineBusy("cpu")
+
+    with patch("app.api.v1.internal.engine_for", return_value=engine):
+        response = client.post(
+            "/api/v1/internal/cache/fetch",
+            json=_params("busy"),
+            headers={cluster.CLUSTER_SECRET_HEADER: "cluster-secret"}
+        )
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+def test_internal_fetch_requires_secret(client, cluster_node):
+    """Test the peer endpoint rejects requests without the cluster secret."""
+    response = client.post("/api/v1/internal/cache/fetch", json=_params("hello"))
+    assert response.status_code == 401
+
+def test_internal_fetch_disabled_without_cluster(client):
+    """Test the peer endpoint is hidden when no cluster is configured."""
+    response = client.post(
+        "/api/v1/internal/cache/fetch",
+        json=_params("hello"),
+        headers={cluster.CLUSTER_SECRET_HEADER: "anything"}
+    )
+    assert response.status_code == 404
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+class _FakeUpstream(BaseHTTPRequestHandler):
+    calls = Counter()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        _FakeUpstream.calls[body["input"]] += 1
+        time.sleep(0.2)
+        content = f"audio:{body['input']}".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def local_cluster():
+    """Three backend processes sharing one fake upstream."""
+    upstream = ThreadingHTTPServer(("127.0.0.1", _free_port()), _FakeUpstream)
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+    _FakeUpstream.calls.clear()
+
+    ports = [_free_port() for _ in range(3)]
+    urls = [f"http://127.0.0.1:{port}" for port in ports]
+    processes = []
+    for port, url in zip(ports, urls):
+        env = {
+            **os.environ,
+            "OPENAI_API_KEY": "test-key",
+            "OPENAI_BASE_URL": f"http://127.0.0.1:{upstream.server_port}/v1",
+            "LLM_PROXY_KEY": "",
+            "CLUSTER_PEERS": ",".join(urls),
+            "CLUSTER_SELF_URL": url,
+            "CLUSTER_SECRET": "cluster-secret",
+        }
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env,
+        ))
+
+    try:
+        deadline = time.time() + 20
+        for url in urls:
+            while True:
+                try:
+                    if httpx.get(f"{url}/health").status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                if time.time() > deadline:
+                    pytest.fail("cluster nodes did not start")
+                time.sleep(0.1)
+        yield urls
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+        upstream.shutdown()
+
+def test_local_cluster_synthesizes_each_key_once(local_cluster):
+    """Test the same text requested on every node reaches the upstream once."""
+    for text in ["First phrase.", "Second phrase.", "Third phrase."]:
+        for n, url in enumerate(local_cluster):
+            response = httpx.post(
+                f"{url}/api/v1/tts/generate",
+                json={"text": text, "voice": "emily"},
+                headers={"X-Device-Id": f"cluster-device-{n}"},
+                timeout=30,
+            )
+            assert response.status_code == 200
+            assert response.content == f"audio:{text}".encode()
+
+    assert _FakeUpstream.calls == {"First phrase.": 1, "Second phrase.": 1, "Third phrase.": 1}
@@ -0,0 +1,204 @@
+import asyncio
+import io
+import os
+import time
+import wave
+import pytest
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app.config import settings
+from app.services import engines
+from app.services.audio_cache import audio_cache
+from app.services.token_service import _device_tokens
+
+STUB_TARGET = "app.services.engines:stub_engine"
+SLOW_TARGET = "tests.test_engines:slow_engine"
+CRASH_TARGET = "tests.test_engines:crashing_engine"
+
+def slow_engine(text, voice, speed):
+    time.sleep(0.5)
+    return engines.stub_engine(text, voice, speed)
+
+def crashing_engine(text, voice, speed):
+    if text == "crash":
+        os._exit(1)
+    return engines.stub_engine(text, voice, speed)
+
+def _shm_segments():
+    return {name for name in os.listdir("/dev/shm") if name.startswith("psm_")}
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+@pytest.fixture(autouse=True)
+def clear_state():
+    """Clear token storage and audio cache before each test."""
+    _device_tokens.clear()
+    audio_cache.clear()
+    yield
+    _device_tokens.clear()
+    audio_cache.clear()
+
+@pytest.fixture(scope="module")
+def cpu_engine():
+    engine = engines.ProcessPoolEngine("cpu", STUB_TARGET, workers=1, queue_limit=2)
+    yield engine
+    engine.shutdown()
+
+@pytest.fixture
+def local_voice(cpu_engine):
+    """Route the emily voice to the process-pool stub engine."""
+    with patch.object(engines, "_local_engines", {"cpu": cpu_engine}), \
+         patch.object(settings, "voice_engines", '{"emily": "cpu"}'):
+        yield cpu_engine
+
+def test_stub_engine_is_deterministic():
+    """Test the stub engine returns 16-bit PCM proportional to text length."""
+    pcm = engines.stub_engine("abc", "emily", 1.0)
+    assert len(pcm) == 3 * 1200 * 2
+    assert pcm == engines.stub_engine("abc", "emily", 1.0)
+    assert len(engines.stub_engine("abc", "emily", 2.0)) == len(pcm) // 2
+
+@pytest.mark.asyncio
+async def test_process_pool_engine_returns_pcm(cpu_engine):
+    """Test a worker process synthesizes PCM and hands it back."""
+    params = {"model": "cpu", "voice": "emily", "input": "Hello", "speed": 1.0, "response_format": "pcm"}
+
+    pcm = await cpu_engine.synthesize(params)
+
+    assert pcm == engines.stub_engine("Hello", "emily", 1.0)
+    assert cpu_engine.pending == 0
+
+@pytest.mark.asyncio
+async def test_process_pool_engine_wav(cpu_engine):
+    """Test wav output wraps the worker's PCM."""
+    params = {"model": "cpu", "voice": "emily", "input": "Hi", "speed": 1.0, "response_format": "wav"}
+
+    audio = await cpu_engine.synthesize(params)
+
+    with wave.open(io.BytesIO(audio)) as w:
+        assert w.getframerate() == engines.PCM_SAMPLE_RATE
+        assert w.getnframes() == 2 * 1200
+
+@pytest.mark.asyncio
+async def test_process_pool_engine_queue_limit():
+    """Test the engine refuses work once workers and queue are full."""
+    engine = engines.ProcessPoolEngine("cpu", STUB_TARGET, workers=1, queue_limit=1)
+    engine.pending = 2
+
+    with pytest.raises(engines.EngineBusy):
+        await engine.synthesize({"input": "Hi", "voice": "emily", "response_format": "pcm"})
+
+def test_synthesis_engine_is_abstract():
+    """Test engines must implement synthesize."""
+    with pytest.raises(TypeError):
+        engines.SynthesisEngine()
+
+@pytest.mark.skipif(not os.path.isdir("/dev/shm"), reason="needs /dev/shm")
+@pytest.mark.asyncio
+async def test_cancelled_synthesis_releases_shared_memory():
+    """Test a request cancelled while the worker runs does not leak its segment."""
+    engine = engines.ProcessPoolEngine("slow", SLOW_TARGET, workers=1, queue_limit=1)
+    try:
+        params = {"input": "Hi", "voice": "emily", "speed": 1.0, "response_format": "pcm"}
+        await engine.synthesize(params)  # start the worker process
+        before = _shm_segments()
+
+        task = asyncio.create_task(engine.synthesize(params))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(1.0)
+
+        assert _shm_segments() == before
+    finally:
+        engine.shutdown()
+
+@pytest.mark.asyncio
+async def test_engine_recovers_from_worker_crash():
+    """Test a dead worker fails its request and the next request gets a new pool."""
+    engine = engines.ProcessPoolEngine("crashy", CRASH_TARGET, workers=1, queue_limit=1)
+    try:
+        with pytest.raises(BrokenProcessPool):
+            await engine.synthesize({"input": "crash", "voice": "emily", "speed": 1.0, "response_format": "pcm"})
+
+        pcm = await engine.synthesize({"input": "Hi", "voice": "emily", "speed": 1.0, "response_format": "pcm"})
+        assert pcm == engines.stub_engine("Hi", "emily", 1.0)
+    finally:
+        engine.shutdown()
+
+def test_voice_engine_selection():
+    """Test voices default to the HTTP engine unless overridden."""
+    voices = {"a": {}, "b": {"engine": "cpu"}}
+    assert engines.voice_engine("a", voices) == engines.HTTP_ENGINE
+    assert engines.voice_engine("b", voices) == "cpu"
+    with patch.object(settings, "voice_engines", '{"a": "gpu"}'):
+        assert engines.voice_engine("a", voices) == "gpu"
+
+def test_generate_with_local_engine(client, local_voice):
+    """Test a voice routed to a local engine is synthesized without the upstream."""
+    with patch("app.api.v1.tts.get_tts_client") as get_client:
+        response = client.post(
+            "/api/v1/tts/generate",
+            json={"text": "Hello", "voice": "emily", "format": "pcm"},
+            headers={"X-Device-Id": "engine-device-001"}
+        )
+
+    assert response.status_code == 200
+    assert response.content == engines.stub_engine("Hello", "emily", 1.0)
+    get_client.assert_not_called()
+
+def test_generate_local_engine_falls_back_to_wav(client, local_voice):
+    """Test the default mp3 request for a local voice is served as wav."""
+    response = client.post(
+        "/api/v1/tts/generate",
+        json={"text": "Hello", "voice": "emily"},
+        headers={"X-Device-Id": "engine-device-002"}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "audio/wav"
+    assert response.headers["content-disposition"].endswith(".wav")
+    with wave.open(io.BytesIO(response.content)) as w:
+        assert w.getnframes() == 5 * 1200
+
+def test_generate_local_engine_busy(client, local_voice):
+    """Test a saturated engine answers 503 with Retry-After."""
+    local_voice.pending = local_voice.workers + local_voice.queue_limit
+    try:
+        response = client.post(
+            "/api/v1/tts/generate",
+            json={"text": "Busy", "voice": "emily", "format": "wav"},
+            headers={"X-Device-Id": "engine-device-003"}
+        )
+    finally:
+        local_voice.pending = 0
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+def test_validate_logs_bad_engine_settings(caplog):
+    """Test invalid engine JSON and routes to missing engines are logged."""
+    with patch.object(settings, "local_engines", "{not json"), \
+         patch.object(settings, "voice_engines", '{"emily": "gpu"}'), \
+         patch.object(engines, "_local_engines", None):
+        engines.validate()
+
+    assert "LOCAL_ENGINES is not valid JSON" in caplog.text
+    assert "routes emily to unconfigured engine gpu" in caplog.text
+
+def test_unconfigured_engine(client):
+    """Test a voice mapped to a missing engine reports it is not configured."""
+    with patch.object(settings, "voice_engines", '{"emily": "missing"}'):
+        response = client.post(
+            "/api/v1/tts/generate",
+            json={"text": "Hello", "voice": "emily"},
+            headers={"X-Device-Id": "engine-device-004"}
+        )
+
+    assert response.status_code == 500
+    assert "not configured" in response.json()["detail"]
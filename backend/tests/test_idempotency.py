@@ -0,0 +1,140 @@
+import asyncio
+import pytest
+from unittest.mock import patch, MagicMock
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.audio_cache import audio_cache
+from app.services.idempotency import IdempotencyConflict, IdempotencyStore, idempotency_store
+from app.services.token_service import _device_tokens
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+@pytest.fixture(autouse=True)
+def clear_state():
+    """Clear token storage, audio cache and idempotency records before each test."""
+    _device_tokens.clear()
+    audio_cache.clear()
+    idempotency_store.clear()
+    yield
+    _device_tokens.clear()
+    audio_cache.clear()
+    idempotency_store.clear()
+
+@pytest.fixture
+def mock_upstream():
+    mock_response = MagicMock()
+    mock_response.content = b"fake audio content"
+    mock_client = MagicMock()
+    mock_client.audio.speech.create.return_value = mock_response
+
+    with patch("app.api.v1.tts.OpenAI", return_value=mock_client), \
+         patch("app.api.v1.tts.settings") as mock_settings:
+        mock_settings.llm_proxy_key = "test-key"
+        mock_settings.llm_proxy_url = "https://test.api"
+        mock_settings.tool_name = "murf-tts"
+        yield mock_client
+
+def _generate(client, key, device_id="idem-device-001", text="Hello world"):
+    return client.post(
+        "/api/v1/tts/generate",
+        json={"text": text, "voice": "emily"},
+        headers={"X-Device-Id": device_id, "Idempotency-Key": key}
+    )
+
+def _result(content=b"audio"):
+    return {"status_code": 200, "content": content, "headers": {}}
+
+def test_retry_replays_without_upstream_or_quota(client, mock_upstream):
+    """Test a retried key replays the result and charges once."""
+    first = _generate(client, "retry-1")
+    audio_cache.clear()
+    second = _generate(client, "retry-1")
+
+    assert first.status_code == second.status_code == 200
+    assert second.content == first.content
+    assert first.headers["Idempotent-Replayed"] == "false"
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert mock_upstream.audio.speech.create.call_count == 1
+
+    status = client.get("/api/v1/tokens/status", headers={"X-Device-Id": "idem-device-001"})
+    assert status.json()["daily_free_used"] == 1
+
+def test_keys_are_scoped_per_device(client, mock_upstream):
+    """Test the same key from another device is a separate generation."""
+    _generate(client, "shared-key", device_id="device-a")
+    response = _generate(client, "shared-key", device_id="device-b")
+
+    assert response.headers["Idempotent-Replayed"] == "false"
+
+def test_key_reused_with_different_body(client, mock_upstream):
+    """Test reusing a key for a different request is rejected."""
+    _generate(client, "reused-key")
+    response = _generate(client, "reused-key", text="Something else")
+
+    assert response.status_code == 422
+
+def test_failed_attempt_is_not_stored(client):
+    """Test an error result is not replayed so the client can retry."""
+    with patch("app.api.v1.tts.settings") as mock_settings:
+        mock_settings.llm_proxy_key = ""
+        mock_settings.openai_api_key = ""
+        assert _generate(client, "fail-key").status_code == 500
+
+    assert len(idempotency_store) == 0
+
+@pytest.mark.asyncio
+async def test_concurrent_retries_attach_to_original():
+    """Test in-flight retries wait for the original instead of running again."""
+    store = IdempotencyStore(ttl=60, max_entries=10, max_bytes=1000)
+    calls = 0
+
+    async def fn():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return _result()
+
+    results = await asyncio.gather(*[store.run("device", "key", "fp", fn) for _ in range(3)])
+
+    assert calls == 1
+    assert sorted(replayed for _, replayed in results) == [False, True, True]
+
+@pytest.mark.asyncio
+async def test_records_expire():
+    """Test records are dropped after the TTL."""
+    store = IdempotencyStore(ttl=0, max_entries=10, max_bytes=1000)
+    await store.run("device", "key", "fp", lambda: asyncio.sleep(0, _result()))
+
+    _, replayed = await store.run("device", "key", "fp", lambda: asyncio.sleep(0, _result()))
+    assert replayed is False
+
+@pytest.mark.asyncio
+async def test_store_is_memory_bounded():
+    """Test oldest records are evicted past the entry and byte limits."""
+    store = IdempotencyStore(ttl=60, max_entries=3, max_bytes=10)
+    for i in range(5):
+        await store.run("device", f"key-{i}", "fp", lambda: asyncio.sleep(0, _result(b"abc")))
+
+    assert len(store) == 3
+    assert store.size == 9
+
+    await store.run("device", "big", "fp", lambda: asyncio.sleep(0, _result(b"0123456789")))
+    assert len(store) == 1
+    assert store.size == 10
+
+@pytest.mark.asyncio
+async def test_conflicting_fingerprint_in_flight():
+    """Test a different request under an in-flight key is rejected."""
+    store = IdempotencyStore(ttl=60, max_entries=10, max_bytes=1000)
+
+    async def slow():
+        await asyncio.sleep(0.01)
+        return _result()
+
+    original = asyncio.create_task(store.run("device", "key", "fp-1", slow))
+    await asyncio.sleep(0)
+    with pytest.raises(IdempotencyConflict):
+        await store.run("device", "key", "fp-2", slow)
+    await original
@@ -0,0 +1,152 @@
+import asyncio
+import os
+import tracemalloc
+import httpx
+import pytest
+from unittest.mock import patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.main import app
+from app.config import settings
+from app.services import profiling, upstream
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+@pytest.fixture
+def profiled_client(tmp_path):
+    """App with the profiling middleware registered."""
+    test_app = FastAPI()
+    test_app.middleware("http")(profiling.profile_requests)
+
+    @test_app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    @test_app.get("/slow")
+    async def slow():
+        await asyncio.sleep(0.05)
+        return {"ok": True}
+
+    with patch("app.services.profiling.settings") as mock_settings:
+        mock_settings.profiling_secret = "test-secret"
+        mock_settings.profiling_sample_every = 0
+        mock_settings.profiling_dir = str(tmp_path)
+        mock_settings.profiling_max_files = 100
+        yield TestClient(test_app), tmp_path, mock_settings
+
+def test_signed_request_is_profiled(profiled_client):
+    """Test a correctly signed request writes a profile to disk."""
+    client, profile_dir, _ = profiled_client
+    signature = profiling.sign_profile_request("test-secret", "GET", "/ping")
+
+    response = client.get("/ping", headers={profiling.PROFILE_HEADER: signature})
+
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+    assert os.path.exists(os.path.join(profile_dir, profile_id))
+
+def test_bad_signature_not_profiled(profiled_client):
+    """Test requests with an invalid or stale signature are not profiled."""
+    client, profile_dir, _ = profiled_client
+    stale = profiling.sign_profile_request("test-secret", "GET", "/ping", timestamp=1)
+
+    for signature in ["123:deadbeef", stale, profiling.sign_profile_request("other", "GET", "/ping")]:
+        response = client.get("/ping", headers={profiling.PROFILE_HEADER: signature})
+        assert response.status_code == 200
+        assert "X-Profile-Id" not in response.headers
+
+    assert os.listdir(profile_dir) == []
+
+def test_sampling_profiles_one_in_n(profiled_client):
+    """Test sampling mode profiles every Nth request."""
+    client, profile_dir, mock_settings = profiled_client
+    mock_settings.profiling_sample_every = 3
+
+    profiled = [
+        "X-Profile-Id" in client.get("/ping").headers
+        for _ in range(9)
+    ]
+
+    assert sum(profiled) == 3
+    assert len(os.listdir(profile_dir)) == 3
+
+@pytest.mark.asyncio
+async def test_overlapping_profiles(profiled_client):
+    """Test a request overlapping a profiled one is served unprofiled."""
+    client, profile_dir, _ = profiled_client
+    signature = profiling.sign_profile_request("test-secret", "GET", "/slow")
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=client.app), base_url="http://test") as http:
+        responses = await asyncio.gather(*[
+            http.get("/slow", headers={profiling.PROFILE_HEADER: signature}) for _ in range(2)
+        ])
+
+    assert [r.status_code for r in responses] == [200, 200]
+    assert sum("X-Profile-Id" in r.headers for r in responses) == 1
+    assert len(os.listdir(profile_dir)) == 1
+
+def test_profile_files_are_capped(profiled_client):
+    """Test only the newest profiles are kept."""
+    client, profile_dir, mock_settings = profiled_client
+    mock_settings.profiling_sample_every = 1
+    mock_settings.profiling_max_files = 2
+    for n in range(3):
+        (profile_dir / f"100{n}-get-old.prof").write_bytes(b"")
+
+    client.get("/ping")
+
+    assert len(os.listdir(profile_dir)) == 2
+    assert not (profile_dir / "1000-get-old.prof").exists()
+
+def test_memory_endpoint_requires_admin(client):
+    """Test memory endpoint is hidden without admin key and rejects bad keys."""
+    with patch("app.api.v1.admin.settings") as mock_settings:
+        mock_settings.admin_api_key = ""
+        response = client.get("/api/v1/admin/debug/memory")
+        assert response.status_code == 404
+
+        mock_settings.admin_api_key = "admin-key"
+        response = client.get("/api/v1/admin/debug/memory", headers={"X-Admin-Key": "wrong"})
+        assert response.status_code == 401
+
+def test_memory_endpoint_groups_by_subsystem(client):
+    """Test memory endpoint reports allocations grouped by subsystem."""
+    from app.services.token_service import _device_tokens
+
+    tracemalloc.start(10)
+    try:
+        with patch("app.api.v1.admin.settings") as mock_settings:
+            mock_settings.admin_api_key = "admin-key"
+            for i in range(200):
+                client.get("/api/v1/tokens/status", headers={"X-Device-Id": f"mem-device-{i}"})
+
+            response = client.get("/api/v1/admin/debug/memory", headers={"X-Admin-Key": "admin-key"})
+    finally:
+        tracemalloc.stop()
+        _device_tokens.clear()
+
+    assert response.status_code == 200
+    data = response.json()
+    assert "_device_tokens" in data["subsystems"]
+    assert data["subsystems"]["_device_tokens"]["size_bytes"] > 0
+    assert data["traced_current_bytes"] > 0
+
+def test_memory_report_attributes_synthesized_audio():
+    """Test audio read from the upstream is reported under audio_buffers."""
+    from openai import DefaultHttpxClient, OpenAI
+
+    chunk = b"\0" * 65536
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=iter([chunk] * 80)))
+    client = OpenAI(api_key="key", base_url="http://upstream.test/v1", http_client=DefaultHttpxClient(transport=transport))
+
+    tracemalloc.start(settings.tracemalloc_frames)
+    try:
+        response = upstream.call_speech(client, "openai", "primary", model="tts-1", voice="nova", input="Hi")
+        report = profiling.memory_report()
+    finally:
+        tracemalloc.stop()
+
+    assert len(response.content) == 80 * 65536
+    assert report["subsystems"]["audio_buffers"]["size_bytes"] >= len(response.content)
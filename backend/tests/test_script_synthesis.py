@@ -0,0 +1,183 @@
+import io
+import wave
+import pytest
+from unittest.mock import patch, MagicMock
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.audio_cache import AudioCache, audio_cache
+from app.services.script_synthesis import SPLICE_FORMATS, split_sentences, synthesize_script
+from app.services.token_service import _device_tokens
+
+SCRIPT = "Welcome to the course. Today we cover planning! Ready? Let's begin."
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+@pytest.fixture(autouse=True)
+def clear_state():
+    """Clear token storage and audio cache before each test."""
+    _device_tokens.clear()
+    audio_cache.clear()
+    yield
+    _device_tokens.clear()
+    audio_cache.clear()
+
+@pytest.fixture
+def mock_upstream():
+    def create(**kwargs):
+        response = MagicMock()
+        response.content = f"<{kwargs['input']}>".encode()
+        return response
+
+    mock_client = MagicMock()
+    mock_client.audio.speech.create.side_effect = create
+
+    with patch("app.api.v1.tts.OpenAI", return_value=mock_client), \
+         patch("app.api.v1.tts.settings") as mock_settings:
+        mock_settings.llm_proxy_key = "test-key"
+        mock_settings.llm_proxy_url = "https://test.api"
+        mock_settings.tool_name = "murf-tts"
+        mock_settings.script_max_concurrency = 4
+        yield mock_client
+
+# MPEG-1 Layer III, 128 kbit/s, 44.1 kHz: 417-byte frames
+MP3_FRAME = b"\xff\xfb\x90\x00" + b"\x00" * 413
+MP3_BITRATES = [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320]
+MP3_SAMPLE_RATES = [44100, 48000, 32000]
+
+def _adts_frame(payload: bytes) -> bytes:
+    length = 7 + len(payload)
+    # AAC LC, 24 kHz, mono, no CRC
+    return bytes([
+        0xFF, 0xF1, 0x58, 0x40 | (length >> 11), (length >> 3) & 0xFF, ((length & 0x7) << 5) | 0x1F, 0xFC
+    ]) + payload
+
+SEGMENTS = {
+    "mp3": MP3_FRAME * 3,
+    "aac": _adts_frame(b"\x01" * 50) * 3,
+    "pcm": b"\x00\x01" * 100,
+}
+
+def _count_frames(audio: bytes, audio_format: str) -> int:
+    """Walk the stream frame by frame; fails unless every byte belongs to one stream."""
+    if audio_format == "wav":
+        with wave.open(io.BytesIO(audio)) as w:
+            assert len(audio) == 44 + w.getnframes() * 2
+            return w.getnframes()
+    if audio_format == "pcm":
+        assert len(audio) % 2 == 0
+        return len(audio) // 2
+
+    pos = frames = 0
+    while pos < len(audio):
+        header = audio[pos:pos + 7]
+        assert header[0] == 0xFF and header[1] & 0xF0 == 0xF0, f"lost sync at {pos}"
+        if audio_format == "mp3":
+            bitrate = MP3_BITRATES[header[2] >> 4] * 1000
+            length = 144 * bitrate // MP3_SAMPLE_RATES[(header[2] >> 2) & 0x3] + ((header[2] >> 1) & 0x1)
+        else:
+            length = ((header[3] & 0x3) << 11) | (header[4] << 3) | (header[5] >> 5)
+        pos += length
+        frames += 1
+    assert pos == len(audio)
+    return frames
+
+def _script(client, text, **extra):
+    return client.post(
+        "/api/v1/tts/script",
+        json={"text": text, "voice": "emily", **extra},
+        headers={"X-Device-Id": "script-device-001"}
+    )
+
+def test_split_sentences():
+    """Test sentence splitting keeps decimals and handles CJK punctuation."""
+    assert split_sentences(SCRIPT) == [
+        "Welcome to the course.", "Today we cover planning!", "Ready?", "Let's begin."
+    ]
+    assert split_sentences("Version 3.5 is out.  Update now") == ["Version 3.5 is out.", "Update now"]
+    assert split_sentences("你好。今天天气很好！\n\nNext line") == ["你好。", "今天天气很好！", "Next line"]
+
+@pytest.mark.asyncio
+async def test_synthesize_script_wav_from_pcm():
+    """Test wav scripts are assembled from pcm segments with one header."""
+    requested = []
+
+    async def create(params):
+        requested.append(params["response_format"])
+        return b"\x00\x01" * 100
+
+    result = await synthesize_script("One. Two.", {"model": "tts-1", "voice": "nova", "speed": 1.0, "response_format": "wav"}, create)
+
+    assert requested == ["pcm", "pcm"]
+    with wave.open(io.BytesIO(result["audio"])) as w:
+        assert w.getframerate() == 24000
+        assert w.getnframes() == 200
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("audio_format", list(SPLICE_FORMATS))
+async def test_spliced_formats_decode_as_one_stream(audio_format):
+    """Test every spliceable format concatenates into a single contiguous stream."""
+    segment = SEGMENTS[SPLICE_FORMATS[audio_format]]
+
+    async def create(params):
+        return segment
+
+    result = await synthesize_script(
+        "One. Two. Three.", {"model": "tts-1", "voice": "nova", "speed": 1.0, "response_format": audio_format}, create
+    )
+
+    segment_format = "pcm" if audio_format == "wav" else audio_format
+    assert _count_frames(result["audio"], audio_format) == 3 * _count_frames(segment, segment_format)
+
+def test_script_splices_sentences(client, mock_upstream):
+    """Test script audio is the sentences' audio in order."""
+    response = _script(client, SCRIPT)
+
+    assert response.status_code == 200
+    assert response.content == b"<Welcome to the course.><Today we cover planning!><Ready?><Let's begin.>"
+    assert response.headers["X-Sentences-Total"] == "4"
+    assert response.headers["X-Sentences-Reused"] == "0"
+
+def test_script_edit_only_resynthesizes_changed_sentence(client, mock_upstream):
+    """Test editing one sentence sends only that sentence upstream."""
+    _script(client, SCRIPT)
+    mock_upstream.audio.speech.create.reset_mock()
+
+    response = _script(client, SCRIPT.replace("Ready?", "Are you ready?"))
+
+    assert response.status_code == 200
+    assert response.headers["X-Sentences-Reused"] == "3"
+    assert mock_upstream.audio.speech.create.call_count == 1
+    assert mock_upstream.audio.speech.create.call_args.kwargs["input"] == "Are you ready?"
+    assert b"<Are you ready?>" in response.content
+
+def test_script_edit_reuses_sentences_in_full_cache(client, mock_upstream):
+    """Test script sentences are reused even when hot entries fill the cache."""
+    cache = AudioCache(max_bytes=400)
+    for n in range(40):
+        for _ in range(3):
+            cache.get(f"hot-{n}")
+        cache.put(f"hot-{n}", b"0123456789")
+    assert cache.size == cache.max_bytes
+
+    with patch("app.services.cluster.audio_cache", cache):
+        _script(client, SCRIPT)
+        mock_upstream.audio.speech.create.reset_mock()
+        response = _script(client, SCRIPT.replace("Ready?", "Are you ready?"))
+
+    assert response.headers["X-Sentences-Reused"] == "3"
+    assert mock_upstream.audio.speech.create.call_count == 1
+
+def test_script_charges_one_generation(client, mock_upstream):
+    """Test a multi-sentence script uses one generation."""
+    _script(client, SCRIPT)
+
+    response = client.get("/api/v1/tokens/status", headers={"X-Device-Id": "script-device-001"})
+    assert response.json()["daily_free_used"] == 1
+
+@pytest.mark.parametrize("audio_format", ["flac", "opus"])
+def test_script_rejects_unspliceable_formats(client, audio_format):
+    """Test formats that cannot be spliced are rejected."""
+    response = _script(client, SCRIPT, format=audio_format)
+    assert response.status_code == 422
@@ -0,0 +1,177 @@
+import threading
+import httpx
+import pytest
+from unittest.mock import patch, MagicMock
+from openai import DefaultHttpxClient, OpenAI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from app.main import app
+from app.config import settings
+from app.services import shadow, upstream
+from app.services.audio_cache import audio_cache
+from app.services.token_service import _device_tokens
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+@pytest.fixture(autouse=True)
+def clear_state():
+    """Clear token storage and audio cache before each test."""
+    _device_tokens.clear()
+    audio_cache.clear()
+    yield
+    _device_tokens.clear()
+    audio_cache.clear()
+
+@pytest.fixture
+def shadow_upstream():
+    """Route shadow calls to an in-process transport and enable shadowing."""
+    calls = []
+    release = threading.Event()
+    release.set()
+
+    def handler(request):
+        calls.append(request)
+        release.wait(5)
+        return httpx.Response(200, content=b"shadow audio bytes")
+
+    def http_client(provider):
+        return DefaultHttpxClient(
+            transport=httpx.MockTransport(handler),
+            event_hooks={"response": [upstream._mark_first_byte]}
+        )
+
+    with patch("app.services.upstream.http_client", http_client), \
+         patch.object(settings, "shadow_sample_rate", 1.0), \
+         patch.object(settings, "shadow_provider", "openai"), \
+         patch.object(settings, "shadow_model", "tts-1-hd"), \
+         patch.object(settings, "openai_api_key", "shadow-key"):
+        yield calls, release
+
+@pytest.fixture
+def mock_primary():
+    mock_response = MagicMock()
+    mock_response.content = b"fake audio content"
+    mock_client = MagicMock()
+    mock_client.audio.speech.create.return_value = mock_response
+
+    with patch("app.api.v1.tts.OpenAI", return_value=mock_client), \
+         patch("app.api.v1.tts.settings") as mock_settings:
+        mock_settings.llm_proxy_key = "test-key"
+        mock_settings.llm_proxy_url = "https://test.api"
+        mock_settings.tool_name = "murf-tts"
+        yield mock_client
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, {"tool": "murf-tts", **labels}) or 0
+
+def test_call_speech_records_metrics():
+    """Test upstream calls record TTFB, duration, bytes and outcome."""
+    labels = {"provider": "openai", "model": "bench-model", "role": "primary"}
+    before = _sample("tts_upstream_ttfb_seconds_count", **labels)
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=b"x" * 2048))
+    client = OpenAI(
+        api_key="key",
+        base_url="http://upstream.test/v1",
+        http_client=DefaultHttpxClient(transport=transport, event_hooks={"response": [upstream._mark_first_byte]})
+    )
+
+    response = upstream.call_speech(client, "openai", "primary", model="bench-model", voice="nova", input="Hi")
+
+    assert response.content == b"x" * 2048
+    assert _sample("tts_upstream_ttfb_seconds_count", **labels) == before + 1
+    assert _sample("tts_upstream_response_bytes_sum", **labels) >= 2048
+    assert _sample("tts_upstream_requests_total", **labels, outcome="ok") >= 1
+
+def test_call_speech_records_errors():
+    """Test failed upstream calls count as errors."""
+    labels = {"provider": "openai", "model": "error-model", "role": "shadow"}
+    client = MagicMock()
+    client.audio.speech.create.side_effect = RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        upstream.call_speech(client, "openai", "shadow", model="error-model")
+
+    assert _sample("tts_upstream_requests_total", **labels, outcome="error") == 1
+
+def test_http_client_is_shared_per_provider():
+    """Test upstream calls reuse one HTTP client per provider until closed."""
+    proxy = upstream.http_client("proxy")
+
+    assert upstream.http_client("proxy") is proxy
+    assert upstream.http_client("openai") is not proxy
+
+    upstream.close()
+    assert proxy.is_closed
+    assert upstream.http_client("proxy") is not proxy
+    upstream.close()
+
+def test_shadow_off_by_default():
+    """Test shadowing is disabled without a sample rate."""
+    assert settings.shadow_sample_rate == 0
+    assert shadow.target() is None
+    assert shadow.maybe_mirror({"model": "tts-1"}) is False
+
+@pytest.mark.asyncio
+async def test_generate_mirrors_to_shadow(shadow_upstream, mock_primary):
+    """Test a sampled request is mirrored without touching the response or quota."""
+    calls, _ = shadow_upstream
+    labels = {"provider": "openai", "model": "tts-1-hd", "role": "shadow"}
+    before = _sample("tts_upstream_requests_total", **labels, outcome="ok")
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post(
+            "/api/v1/tts/generate",
+            json={"text": "Hello world", "voice": "emily"},
+            headers={"X-Device-Id": "shadow-device-001"}
+        )
+        await shadow.drain()
+        status = await client.get("/api/v1/tokens/status", headers={"X-Device-Id": "shadow-device-001"})
+
+    assert response.status_code == 200
+    assert response.content == b"fake audio content"
+    assert len(calls) == 1
+    assert b'"model":"tts-1-hd"' in calls[0].content.replace(b" ", b"")
+    assert _sample("tts_upstream_requests_total", **labels, outcome="ok") == before + 1
+    assert status.json()["daily_free_used"] == 1
+
+@pytest.mark.asyncio
+async def test_shadow_concurrency_is_bounded(shadow_upstream):
+    """Test requests beyond the shadow concurrency limit are dropped, not queued."""
+    calls, release = shadow_upstream
+    release.clear()
+    params = {"model": "tts-1", "voice": "nova", "input": "Hi", "speed": 1.0, "response_format": "mp3"}
+
+    mirrored = [shadow.maybe_mirror(params) for _ in range(settings.shadow_max_concurrency + 3)]
+    release.set()
+    await shadow.drain()
+
+    assert mirrored.count(True) == settings.shadow_max_concurrency
+    assert len(calls) == settings.shadow_max_concurrency
+
+@pytest.mark.parametrize("sample_rate", [0.0, 1.0])
+def test_misconfigured_shadow_never_breaks_generate(client, mock_primary, sample_rate):
+    """Test an unknown shadow provider leaves primary traffic untouched."""
+    with patch.object(settings, "shadow_sample_rate", sample_rate), \
+         patch.object(settings, "shadow_provider", "azure"):
+        response = client.post(
+            "/api/v1/tts/generate",
+            json={"text": "Hello world", "voice": "emily"},
+            headers={"X-Device-Id": "shadow-device-002"}
+        )
+
+    assert response.status_code == 200
+    assert response.content == b"fake audio content"
+
+def test_validate_disables_unknown_provider():
+    """Test an unknown shadow provider is reported once and shadowing turned off."""
+    with patch.object(settings, "shadow_sample_rate", 1.0), \
+         patch.object(settings, "shadow_provider", "azure"):
+        shadow.validate()
+        try:
+            assert shadow.target() is None
+            assert shadow.maybe_mirror({"model": "tts-1"}) is False
+        finally:
+            with patch.object(settings, "shadow_sample_rate", 0):
+                shadow.validate()
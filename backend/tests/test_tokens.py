@@ -1,7 +1,9 @@
 import pytest
+from unittest.mock import patch
 from fastapi.testclient import TestClient
 from app.main import app
-from app.services.token_service import TokenService, _device_tokens
+from app.config import settings
+from app.services.token_service import TokenService, _device_tokens, _status_snapshots
 
 @pytest.fixture
 def client():
@@ -104,3 +106,72 @@ async def test_token_service_premium_uses_purchased():
     status = await service.get_status(device_id)
     assert status["tokens_remaining"] == 9
     assert status["daily_free_used"] == 0  # Free not touched
+
+def test_get_token_status_etag(client):
+    """Test an unchanged status is answered with 304."""
+    headers = {"X-Device-Id": "etag-device-001"}
+    first = client.get("/api/v1/tokens/status", headers=headers)
+    etag = first.headers["ETag"]
+
+    second = client.get("/api/v1/tokens/status", headers={**headers, "If-None-Match": etag})
+
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["ETag"] == etag
+
+@pytest.mark.asyncio
+async def test_get_token_status_invalidated_by_quota_change(client):
+    """Test generations and purchases change the status and its ETag."""
+    headers = {"X-Device-Id": "etag-device-002"}
+    etag = client.get("/api/v1/tokens/status", headers=headers).headers["ETag"]
+
+    await TokenService().use_generation("etag-device-002")
+    response = client.get("/api/v1/tokens/status", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["daily_free_used"] == 1
+
+    await TokenService().add_tokens("etag-device-002", 20)
+    response = client.get("/api/v1/tokens/status", headers={**headers, "If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 200
+    assert response.json()["tokens_remaining"] == 20
+
+def test_get_token_status_is_read_only(client):
+    """Test polling an unknown device does not create a record."""
+    client.get("/api/v1/tokens/status", headers={"X-Device-Id": "unknown-device-001"})
+    assert "unknown-device-001" not in _device_tokens
+
+@pytest.mark.asyncio
+async def test_bulk_token_status(client):
+    """Test the admin bulk query returns statuses in request order."""
+    await TokenService().add_tokens("bulk-device-002", 10)
+
+    with patch.object(settings, "admin_api_key", "secret"):
+        denied = client.post("/api/v1/admin/tokens/status", json={"device_ids": ["bulk-device-001"]})
+        response = client.post(
+            "/api/v1/admin/tokens/status",
+            json={"device_ids": ["bulk-device-001", "bulk-device-002"]},
+            headers={"X-Admin-Key": "secret"}
+        )
+
+    assert denied.status_code == 401
+    statuses = response.json()["statuses"]
+    assert [s["device_id"] for s in statuses] == ["bulk-device-001", "bulk-device-002"]
+    assert statuses[0]["tokens_remaining"] == 5
+    assert statuses[1]["tokens_remaining"] == 10
+    assert statuses[1]["is_premium"] is True
+
+def test_bulk_token_status_does_not_fill_snapshot_cache(client):
+    """Test a bulk query neither evicts nor adds polling snapshots."""
+    client.get("/api/v1/tokens/status", headers={"X-Device-Id": "polling-device-001"})
+
+    with patch.object(settings, "admin_api_key", "secret"), \
+         patch.object(settings, "status_cache_max_entries", 10):
+        response = client.post(
+            "/api/v1/admin/tokens/status",
+            json={"device_ids": [f"bulk-device-{n}" for n in range(100)] + ["polling-device-001"]},
+            headers={"X-Admin-Key": "secret"}
+        )
+
+    assert len(response.json()["statuses"]) == 101
+    assert "polling-device-001" in _status_snapshots
+    assert "bulk-device-0" not in _status_snapshots
@@ -0,0 +1,115 @@
+import json
+import pytest
+from unittest.mock import patch, MagicMock
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from app.main import app
+from app.services.audio_cache import audio_cache
+from app.services.token_service import _device_tokens
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+@pytest.fixture(autouse=True)
+def clear_tokens():
+    """Clear token storage and audio cache before each test."""
+    _device_tokens.clear()
+    audio_cache.clear()
+    yield
+    _device_tokens.clear()
+    audio_cache.clear()
+
+@pytest.fixture
+def mock_upstream():
+    mock_response = MagicMock()
+    mock_response.content = b"fake audio content"
+    mock_client = MagicMock()
+    mock_client.audio.speech.create.return_value = mock_response
+
+    with patch("app.api.v1.tts.OpenAI", return_value=mock_client), \
+         patch("app.api.v1.tts.settings") as mock_settings:
+        mock_settings.llm_proxy_key = "test-key"
+        mock_settings.llm_proxy_url = "https://test.api"
+        mock_settings.tool_name = "murf-tts"
+        yield mock_client
+
+def _generate(client):
+    return client.post(
+        "/api/v1/tts/generate",
+        json={"text": "Hello world", "voice": "emily"},
+        headers={"X-Device-Id": "trace-device-001"}
+    )
+
+def _stage_count(stage):
+    return REGISTRY.get_sample_value(
+        "tts_stage_duration_seconds_count", {"tool": "murf-tts", "stage": stage}
+    ) or 0
+
+def test_server_timing_header(client, mock_upstream):
+    """Test generation responses break down time by stage."""
+    response = _generate(client)
+
+    assert response.status_code == 200
+    timing = response.headers["Server-Timing"]
+    for stage in ["voice", "quota", "upstream_queue", "upstream", "total"]:
+        assert f"{stage};dur=" in timing
+
+def test_spans_observed_in_histogram(client, mock_upstream):
+    """Test every span is also recorded in the stage histogram."""
+    before = {stage: _stage_count(stage) for stage in ["quota", "upstream", "stream"]}
+
+    _generate(client)
+
+    for stage, count in before.items():
+        assert _stage_count(stage) == count + 1
+
+def test_trace_export_json_lines(client, mock_upstream, tmp_path):
+    """Test sampled traces are written as JSON lines."""
+    trace_file = tmp_path / "traces.jsonl"
+
+    with patch("app.services.tracing.settings") as mock_settings:
+        mock_settings.tool_name = "murf-tts"
+        mock_settings.trace_export = str(trace_file)
+        mock_settings.trace_sample_rate = 1.0
+        _generate(client)
+        _generate(client)
+
+    lines = trace_file.read_text().splitlines()
+    assert len(lines) == 2
+    record = json.loads(lines[0])
+    assert record["name"] == "tts.generate"
+    assert record["attributes"]["status"] == 200
+    assert record["attributes"]["voice"] == "emily"
+    assert [s["name"] for s in record["spans"]] == ["voice", "quota", "upstream_queue", "upstream", "stream"]
+
+def test_trace_export_sampling(client, mock_upstream, tmp_path):
+    """Test sample rate of zero exports nothing."""
+    trace_file = tmp_path / "traces.jsonl"
+
+    with patch("app.services.tracing.settings") as mock_settings:
+        mock_settings.tool_name = "murf-tts"
+        mock_settings.trace_export = str(trace_file)
+        mock_settings.trace_sample_rate = 0.0
+        _generate(client)
+
+    assert not trace_file.exists()
+
+def test_trace_export_on_error(tmp_path):
+    """Test failed requests still export their trace with the status."""
+    trace_file = tmp_path / "traces.jsonl"
+    client = TestClient(app)
+
+    with patch("app.services.tracing.settings") as mock_settings:
+        mock_settings.tool_name = "murf-tts"
+        mock_settings.trace_export = str(trace_file)
+        mock_settings.trace_sample_rate = 1.0
+        response = client.post(
+            "/api/v1/tts/generate",
+            json={"text": "Hello", "voice": "invalid"},
+            headers={"X-Device-Id": "trace-device-002"}
+        )
+
+    assert response.status_code == 400
+    record = json.loads(trace_file.read_text())
+    assert record["attributes"]["status"] == 400
@@ -2,11 +2,22 @@ import pytest
 from unittest.mock import patch, MagicMock
 from fastapi.testclient import TestClient
 from app.main import app
+from app.services.audio_cache import audio_cache
+from app.services.token_service import TokenService, _device_tokens
 
 @pytest.fixture
 def client():
     return TestClient(app)
 
+@pytest.fixture(autouse=True)
+def clear_tokens():
+    """Clear token storage and audio cache before each test."""
+    _device_tokens.clear()
+    audio_cache.clear()
+    yield
+    _device_tokens.clear()
+    audio_cache.clear()
+
 @pytest.fixture
 def device_id():
     return "test-device-tts-001"
@@ -147,3 +158,80 @@ def test_error_detail_format_payment_required(client):
             f"Object detail must have 'error' or 'message': {detail}"
     else:
         assert isinstance(detail, str), f"detail must be string or object: {detail}"
+
+def test_generate_invalid_format(client, device_id):
+    """Test unsupported formats are rejected up front."""
+    response = client.post(
+        "/api/v1/tts/generate",
+        json={"text": "Hello", "voice": "emily", "format": "ogg-vorbis"},
+        headers={"X-Device-Id": device_id}
+    )
+    assert response.status_code == 422
+
+@pytest.mark.parametrize("audio_format,media_type,extension", [
+    ("opus", "audio/ogg", "opus"),
+    ("aac", "audio/aac", "aac"),
+    ("flac", "audio/flac", "flac"),
+    ("wav", "audio/wav", "wav"),
+    ("pcm", "application/octet-stream", "pcm"),
+])
+@patch("app.api.v1.tts.OpenAI")
+def test_generate_formats(mock_openai, audio_format, media_type, extension, client, device_id):
+    """Test each output format gets its media type and filename extension."""
+    mock_response = MagicMock()
+    mock_response.content = b"fake audio content"
+    mock_client = MagicMock()
+    mock_client.audio.speech.create.return_value = mock_response
+    mock_openai.return_value = mock_client
+
+    with patch("app.api.v1.tts.settings") as mock_settings:
+        mock_settings.llm_proxy_key = "test-key"
+        mock_settings.llm_proxy_url = "https://test.api"
+        mock_settings.tool_name = "murf-tts"
+
+        response = client.post(
+            "/api/v1/tts/generate",
+            json={"text": "Hello world", "voice": "emily", "format": audio_format},
+            headers={"X-Device-Id": device_id}
+        )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(media_type)
+    assert response.headers["content-disposition"].endswith(f".{extension}")
+    assert mock_client.audio.speech.create.call_args.kwargs["response_format"] == audio_format
+
+@pytest.mark.asyncio
+@patch("app.api.v1.tts.OpenAI")
+async def test_generate_hd_quality(mock_openai, client, device_id):
+    """Test hd quality selects the higher fidelity model for premium devices."""
+    await TokenService().add_tokens(device_id, 5)
+    mock_response = MagicMock()
+    mock_response.content = b"fake audio content"
+    mock_client = MagicMock()
+    mock_client.audio.speech.create.return_value = mock_response
+    mock_openai.return_value = mock_client
+
+    with patch("app.api.v1.tts.settings") as mock_settings:
+        mock_settings.llm_proxy_key = "test-key"
+        mock_settings.llm_proxy_url = "https://test.api"
+        mock_settings.tool_name = "murf-tts"
+
+        response = client.post(
+            "/api/v1/tts/generate",
+            json={"text": "Hello world", "voice": "emily", "quality": "hd"},
+            headers={"X-Device-Id": device_id}
+        )
+
+    assert response.status_code == 200
+    assert mock_client.audio.speech.create.call_args.kwargs["model"] == "tts-1-hd"
+
+def test_generate_hd_quality_requires_premium(client, device_id):
+    """Test free-tier devices cannot request hd quality."""
+    response = client.post(
+        "/api/v1/tts/generate",
+        json={"text": "Hello world", "voice": "emily", "quality": "hd"},
+        headers={"X-Device-Id": device_id}
+    )
+
+    assert response.status_code == 402
+    assert response.json()["detail"]["code"] == "premium_required"
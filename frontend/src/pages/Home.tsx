@@ -13,6 +13,7 @@ export default function Home() {
   const [isLoading, setIsLoading] = useState(false)
   const [error, setError] = useState<string | null>(null)
   const [audioUrl, setAudioUrl] = useState<string | null>(null)
+  const [audioExtension, setAudioExtension] = useState('mp3')
   const audioRef = useRef<HTMLAudioElement>(null)
   const { tokensRemaining, deviceId, refreshStatus } = useTokenStore()
 
@@ -35,6 +36,8 @@ export default function Home() {
       const audioBlob = await generateSpeech(text, voice, speed, deviceId)
       const url = URL.createObjectURL(audioBlob)
       setAudioUrl(url)
+      // Voices served by a local engine come back as wav
+      setAudioExtension(audioBlob.type === 'audio/wav' ? 'wav' : 'mp3')
       await refreshStatus()
       
       setTimeout(() => {
@@ -52,7 +55,7 @@ export default function Home() {
     if (audioUrl) {
       const a = document.createElement('a')
       a.href = audioUrl
-      a.download = 'murf-tts-audio.mp3'
+      a.download = `murf-tts-audio.${audioExtension}`
       a.click()
     }
   }